@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Runs main.py's Flask app for load testing, with the campus APIs replaced by a local
+# stub and, by default, MySQL replaced by a SQLite stand-in. Started by load_test.py:
+#   python benchmarks/bench_server.py --port 5055 --db sqlite
+# Adds GET /bench/stats, which reports how many SQL statements the app has run.
+# With --proxy it runs proxy_server.py's app instead, against the same kind of stub.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import MIGRATIONS  # Needs the repository root on sys.path
+
+SQLITE_SCHEMA = """
+CREATE TABLE venue (VenueID TEXT PRIMARY KEY, VenueDesc TEXT NOT NULL, VenueID2 TEXT NOT NULL, VenueClassType TEXT);
+CREATE TABLE machines (machineID INTEGER PRIMARY KEY AUTOINCREMENT, machineName TEXT NOT NULL);
+CREATE TABLE venue_assigned_machines (machineID INTEGER NOT NULL UNIQUE, VenueID TEXT NOT NULL);
+CREATE TABLE current_announcement (id INTEGER PRIMARY KEY, content TEXT NOT NULL, isImage INTEGER NOT NULL);
+CREATE TABLE current_faculty (
+    id INTEGER PRIMARY KEY, empID TEXT NOT NULL, full_name TEXT NOT NULL, isPresent INTEGER NOT NULL,
+    start_time TEXT NOT NULL, end_time TEXT NOT NULL
+);
+CREATE TABLE fingerprints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, EmployeeNo TEXT, fingerprint_template BLOB,
+    version INTEGER NOT NULL DEFAULT 0, updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE fingerprint_sync_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE fingerprint_deletions (
+    fingerprint_id INTEGER PRIMARY KEY, EmployeeNo TEXT, version INTEGER NOT NULL,
+    deleted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE student_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, studID TEXT NOT NULL, full_name TEXT NOT NULL, instructor TEXT NOT NULL,
+    time_arrived TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, yr_section TEXT NOT NULL, lab_name TEXT NOT NULL
+);
+CREATE INDEX idx_student_logs_stud_time ON student_logs (studID, time_arrived);
+CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, description TEXT NOT NULL);
+"""
+
+query_count = 0
+query_count_lock = threading.Lock()
+
+# Rewrite the MySQL dialect used in main.py into SQLite
+def translate(query):
+    query = query.replace('%s', '?').replace(' FOR UPDATE', '')  # SQLite locks the whole database on write
+    query = re.sub(
+        r'ON DUPLICATE KEY UPDATE (\w+) = VALUES\((\w+)\)',
+        r'ON CONFLICT(machineID) DO UPDATE SET \1 = excluded.\2',
+        query
+    )
+    return query
+
+def count_queries(n=1):
+    global query_count
+    with query_count_lock:
+        query_count += n
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary):
+        self.cursor = connection.cursor()
+        self.dictionary = dictionary
+
+    def execute(self, query, params=()):
+        count_queries()
+        self.cursor.execute(translate(query), params or ())
+
+    def executemany(self, query, rows):
+        count_queries()
+        self.cursor.executemany(translate(query), rows)
+
+    def make_row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return dict(zip([column[0] for column in self.cursor.description], row))
+
+    def fetchone(self):
+        return self.make_row(self.cursor.fetchone())
+
+    def fetchall(self):
+        return [self.make_row(row) for row in self.cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self.connection, dictionary)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+    def is_connected(self):
+        return True
+
+class SQLitePool:
+    def __init__(self, path):
+        self.path = path
+
+    def get_connection(self):
+        return SQLiteConnection(self.path)
+
+def create_sqlite_db(path, machines, venues):
+    connection = sqlite3.connect(path)
+    connection.executescript(SQLITE_SCHEMA)
+    connection.executemany(
+        "INSERT INTO venue (VenueID, VenueDesc, VenueID2) VALUES (?, ?, ?)",
+        [(f"V{i}", f"Laboratory {i}", f"V{i}") for i in range(1, venues + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO machines (machineID, machineName) VALUES (?, ?)",
+        [(i, f"PC-{i:03d}") for i in range(1, machines + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO venue_assigned_machines (machineID, VenueID) VALUES (?, ?)",
+        [(i, f"V{(i - 1) % venues + 1}") for i in range(1, machines + 1)]
+    )
+    connection.execute("INSERT INTO current_announcement (id, content, isImage) VALUES (1, 'Welcome to the lab!', 0)")
+    connection.execute(
+        "INSERT INTO current_faculty (id, empID, full_name, isPresent, start_time, end_time) "
+        "VALUES (1, 'EMP-0001', 'Maria Santos', 1, '07:00:00', '21:00:00')"
+    )
+    connection.executemany(
+        "INSERT INTO fingerprints (EmployeeNo, fingerprint_template, version) VALUES (?, ?, ?)",
+        [(f"EMP-{i:04d}", os.urandom(1024), i) for i in range(1, 51)]
+    )
+    connection.execute("INSERT INTO fingerprint_sync_version (id, version) VALUES (1, 50)")
+    # The SQLite schema above already matches every migration
+    connection.executemany(
+        "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+        [(version, description) for version, description, _ in MIGRATIONS]
+    )
+    connection.commit()
+    connection.close()
+
+# One week of classes for a venue, shaped like the CoursePlotting response
+def stub_schedule(venue_id):
+    classes = []
+    for day in range(1, 7):
+        for start in (7, 10, 13, 16):
+            classes.append({
+                'VenueID': venue_id, 'DayOfWeek': str(day),
+                'StartTime': f"{start:02d}:00:00", 'EndTime': f"{start + 3:02d}:00:00",
+                'CourseCode': f"CS{day}{start}", 'CourseName': 'INTRODUCTION TO COMPUTING',
+                'EmployeeNo': 'EMP-0001', 'FirstName': 'MARIA', 'LastName': 'SANTOS',
+                'ProgramAbbr': 'BSCS', 'YearLevel': '3', 'Section': 'A',
+            })
+    return {'status': 200, 'data': classes}
+
+def make_stub_upstream(latency):
+    class StubUpstream(BaseHTTPRequestHandler):
+        def send_json(self, body, status=200):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(latency)
+            self.send_json(stub_schedule(payload.get('VenueID')))
+
+        def do_GET(self):
+            uid = self.path.rsplit('/', 1)[-1]
+            time.sleep(latency)
+            self.send_json({
+                'status': 200,
+                'StudentInfo': {
+                    'StudentNo': f"2023-{uid[-5:]}", 'FirstName': 'Juan', 'LastName': 'Dela Cruz',
+                    'CourseAbbr': 'BSCS', 'Year': '3', 'Section': 'A',
+                },
+                'Picture': 'A' * 20000,
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubUpstream
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main.py for load testing.")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--db', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--machines', type=int, default=200)
+    parser.add_argument('--venues', type=int, default=20)
+    parser.add_argument('--upstream-latency', type=float, default=0.15, help="Seconds the stub campus APIs take")
+    parser.add_argument('--gunicorn-threads', type=int, help="Serve with gunicorn (one gthread worker) instead of Werkzeug")
+    parser.add_argument('--proxy', action='store_true', help="Serve proxy_server.py's routes instead of the Flask app")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='maclab_bench_')
+    os.environ.setdefault('ANNOUNCEMENT_ASSET_DIR', os.path.join(workdir, 'announcement_assets'))
+    os.environ.setdefault('STUDENT_LOG_SPOOL_DIR', os.path.join(workdir, 'student_log_spool'))
+    os.environ.setdefault('FACULTY_VENUE_ID', 'V1')  # Several venues, as on campus; V1 drives current_faculty
+
+    import main as api
+    from flask import jsonify
+    from werkzeug.serving import make_server
+
+    if args.db == 'sqlite' and not args.proxy:
+        path = os.path.join(workdir, 'maclab_bench.sqlite3')
+        create_sqlite_db(path, args.machines, args.venues)
+        pool = SQLitePool(path)
+        api.get_db_pool = lambda: pool
+
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), make_stub_upstream(args.upstream_latency))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_port}"
+    api.COURSE_PLOTTING_URL = f"{stub_url}/CoursePlotting"
+    api.student_lookup_request = lambda uid: (f"{stub_url}/StudentInfoByCard/{uid}", {})
+
+    if args.proxy:
+        run_proxy(args.port)
+        return
+
+    @api.app.route('/bench/stats', methods=['GET'])
+    def bench_stats():
+        if args.db == 'sqlite':
+            queries = query_count
+        else:
+            # Server-wide statement counter; run against an otherwise idle MySQL
+            with api.app.app_context():
+                cursor = api.get_db_connection().cursor()
+                cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+                queries = int(cursor.fetchone()[1])
+                cursor.close()
+        return jsonify({'queries': queries}), 200
+
+    if args.gunicorn_threads:
+        run_gunicorn(api.app, args.port, args.gunicorn_threads)
+        return
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No per-request access log
+    server = make_server('127.0.0.1', args.port, api.app, threaded=True)
+    print(f"Benchmark server ready on http://127.0.0.1:{args.port} ({args.db})", flush=True)
+    server.serve_forever()
+
+# A separate process, as in production, so it has its own student cache
+def run_proxy(port):
+    import proxy_server
+    from aiohttp import web
+
+    print(f"Benchmark proxy ready on http://127.0.0.1:{port}", flush=True)
+    web.run_app(
+        proxy_server.create_app(), host='127.0.0.1', port=port,
+        handler_cancellation=True, print=None, access_log=None,
+    )
+
+# Serve the prepared app with gunicorn.conf.py's settings, one worker and the given thread count,
+# so WEB_THREADS can be sized from a load test. The app is built before forking, like --preload
+def run_gunicorn(app, port, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class BenchApplication(BaseApplication):
+        def load_config(self):
+            settings = {}
+            exec(open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')).read(), settings)
+            for key, value in settings.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set('bind', f'127.0.0.1:{port}')
+            self.cfg.set('workers', 1)
+            self.cfg.set('threads', threads)
+            self.cfg.set('accesslog', None)
+
+        def load(self):
+            return app
+
+    print(f"Benchmark server ready on http://127.0.0.1:{port} (gunicorn, {threads} threads)", flush=True)
+    BenchApplication().run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+import aiohttp
+
+# Load test for the Flask API: simulates N displays running the renderer's request pattern
+#
+#   pip install aiohttp
+#   python benchmarks/load_test.py --displays 100 --duration 60
+#
+# By default it starts benchmarks/bench_server.py (SQLite stand-in, stubbed campus APIs),
+# and a second one with --proxy that serves the /proxy routes, as proxy_server.py does on
+# port 5001 for the displays. Use --db mysql to run against the local MySQL from main.py's
+# DB_* settings, or --url (and --proxy-url) to target servers that are already running.
+# With --mode renderer (the default) each display does what the current renderer does:
+#   - GETs /api/display/<machineID> and its venue's /api/venues/<id>/current_class on startup
+#   - holds one /api/events stream open for the whole run, and refetches what an event names
+#     (/api/pctovenue/<machineID> on venue_reassigned, /api/announcement on announcement_updated)
+#   - repeats the announcement and current-class GETs every --fallback-interval seconds
+#   - taps a card (GET /proxy/students/<uid>, POST /api/student_logs) every --tap-interval seconds
+# and a console reassigns a random machine every --reassign-interval seconds, so events fan out
+# to every stream. --mode polling is the older renderer, which polled instead of streaming:
+#   - GETs /api/announcement every --announcement-interval seconds
+#   - GETs /api/pctovenue and /api/venues/<id>/current_class every --venue-interval seconds
+# GETs send If-None-Match like the browser cache does. Results are written as JSON to
+# benchmarks/results/; pass an earlier file as --baseline to print the difference.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.events = 0  # Events received, for streams
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'not_modified': self.not_modified,
+            'rps': round(len(latencies) / duration, 2),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'mean_bytes': round(self.bytes / len(latencies)) if latencies else 0,
+            'events': self.events,
+        }
+
+async def timed_request(session, stats, name, method, url, etags=None, **kwargs):
+    headers = {}
+    if etags is not None and url in etags:
+        headers['If-None-Match'] = etags[url]
+    started = time.perf_counter()
+    try:
+        async with session.request(method, url, headers=headers, **kwargs) as response:
+            body = await response.read()
+            elapsed = (time.perf_counter() - started) * 1000
+            route = stats.setdefault(name, RouteStats())
+            route.latencies.append(elapsed)
+            route.bytes += len(body)
+            if response.status == 304:
+                route.not_modified += 1
+            elif response.status >= 400:
+                route.errors += 1
+            if etags is not None and 'ETag' in response.headers:
+                etags[url] = response.headers['ETag']
+            return json.loads(body) if response.status < 300 and body else None
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        stats.setdefault(name, RouteStats()).errors += 1
+        return None
+
+async def every(interval, stop_at, action):
+    # Displays don't start in lockstep
+    await asyncio.sleep(max(0, min(random.uniform(0, interval), stop_at - time.monotonic())))
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        await action()
+        await asyncio.sleep(max(0, min(started + interval, stop_at) - time.monotonic()))
+
+# Hold an /api/events stream until stop_at; the latency recorded is the time to the response headers
+async def follow_events(session, args, stats, stop_at, on_event):
+    name = 'GET /api/events (stream)'
+    route = stats.setdefault(name, RouteStats())
+    started = time.perf_counter()
+    try:
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+        async with session.get(f"{args.url}/api/events", timeout=timeout) as response:
+            route.latencies.append((time.perf_counter() - started) * 1000)
+            if response.status != 200:
+                route.errors += 1
+                return
+            event_type = None
+            while time.monotonic() < stop_at:
+                try:
+                    line = await asyncio.wait_for(response.content.readline(), stop_at - time.monotonic())
+                except asyncio.TimeoutError:
+                    return
+                if not line:
+                    route.errors += 1  # The server closed the stream
+                    return
+                route.bytes += len(line)
+                line = line.decode().rstrip('\n')
+                if line.startswith('event: '):
+                    event_type = line[len('event: '):]
+                elif line.startswith('data: ') and event_type:
+                    route.events += 1
+                    await on_event(event_type, json.loads(line[len('data: '):]))
+                    event_type = None
+    except (aiohttp.ClientError, ValueError):
+        route.errors += 1
+
+async def run_renderer_display(session, args, machine_id, stats, stop_at):
+    etags = {}
+    venue = {'id': None}
+
+    async def fetch_announcement():
+        await timed_request(session, stats, 'GET /api/announcement', 'GET', f"{args.url}/api/announcement", etags)
+
+    async def fetch_current_class():
+        if venue['id']:
+            await timed_request(
+                session, stats, 'GET /api/venues/<id>/current_class', 'GET',
+                f"{args.url}/api/venues/{venue['id']}/current_class", etags
+            )
+
+    async def fetch_venue():
+        row = await timed_request(
+            session, stats, 'GET /api/pctovenue/<id>', 'GET', f"{args.url}/api/pctovenue/{machine_id}", etags
+        )
+        if row and row.get('VenueID') != venue['id']:
+            venue['id'] = row['VenueID']
+            await fetch_current_class()
+
+    async def on_event(event_type, data):
+        if event_type == 'venue_reassigned' and int(data['machineID']) == machine_id:
+            await fetch_venue()
+        elif event_type == 'machines_changed':
+            await fetch_venue()
+        elif event_type == 'announcement_updated':
+            await fetch_announcement()
+        elif event_type == 'resync':
+            await fetch_announcement()
+            await fetch_current_class()
+
+    async def fallback_polls():
+        await fetch_announcement()
+        await fetch_current_class()
+
+    async def tap_card():
+        await tap_student_card(session, args, stats, venue['id'] or '')
+
+    # Displays don't start in lockstep
+    await asyncio.sleep(random.uniform(0, min(5, args.duration / 10)))
+    bootstrap = await timed_request(
+        session, stats, 'GET /api/display/<id>', 'GET', f"{args.url}/api/display/{machine_id}", etags
+    )
+    if bootstrap and bootstrap.get('venue'):
+        venue['id'] = bootstrap['venue']['VenueID']
+    await fetch_current_class()
+    await asyncio.gather(
+        follow_events(session, args, stats, stop_at, on_event),
+        every(args.fallback_interval, stop_at, fallback_polls),
+        every(args.tap_interval, stop_at, tap_card),
+    )
+
+# The admin console moving machines between venues; each move is an event on every stream
+async def run_console(session, args, stats, stop_at):
+    async def reassign():
+        machine_id = random.randrange(1, args.displays + 1)
+        await timed_request(session, stats, 'PUT /api/update_venue', 'PUT', f"{args.url}/api/update_venue", json={
+            'machineID': machine_id, 'VenueID': f"V{random.randrange(args.venues) + 1}",
+        })
+
+    await every(args.reassign_interval, stop_at, reassign)
+
+async def tap_student_card(session, args, stats, venue_id):
+    uid = f"{random.randrange(args.students):08x}"
+    student = await timed_request(
+        session, stats, 'GET /proxy/students/<uid>', 'GET', f"{args.proxy_url}/proxy/students/{uid}"
+    )
+    if student and student.get('status') == 200:
+        info = student['StudentInfo']
+        await timed_request(session, stats, 'POST /api/student_logs', 'POST', f"{args.url}/api/student_logs", json={
+            'studID': info['StudentNo'],
+            'full_name': f"{info['FirstName']} {info['LastName']}",
+            'instructor': 'Maria Santos',
+            'yr_section': f"{info['CourseAbbr']} {info['Year']}{info['Section']}",
+            'lab_name': f"Laboratory {venue_id[1:]}",
+        })
+
+async def run_display(session, args, machine_id, stats, stop_at):
+    etags = {}
+    venue_id = f"V{(machine_id - 1) % args.venues + 1}"
+
+    async def poll_announcement():
+        await timed_request(session, stats, 'GET /api/announcement', 'GET', f"{args.url}/api/announcement", etags)
+
+    async def poll_venue():
+        await timed_request(session, stats, 'GET /api/pctovenue', 'GET', f"{args.url}/api/pctovenue", etags)
+        await timed_request(
+            session, stats, 'GET /api/venues/<id>/current_class', 'GET',
+            f"{args.url}/api/venues/{venue_id}/current_class", etags
+        )
+
+    async def tap_card():
+        await tap_student_card(session, args, stats, venue_id)
+
+    await asyncio.gather(
+        every(args.announcement_interval, stop_at, poll_announcement),
+        every(args.venue_interval, stop_at, poll_venue),
+        every(args.tap_interval, stop_at, tap_card),
+    )
+
+async def get_query_count(session, url):
+    try:
+        async with session.get(f"{url}/bench/stats") as response:
+            return (await response.json())['queries'] if response.status == 200 else None
+    except (aiohttp.ClientError, ValueError):
+        return None
+
+async def run_load(args):
+    stats = {}
+    connector = aiohttp.TCPConnector(limit=args.displays * 2)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        queries_before = await get_query_count(session, args.url)
+        started = time.monotonic()
+        stop_at = started + args.duration
+        if args.mode == 'renderer':
+            tasks = [run_renderer_display(session, args, machine_id, stats, stop_at)
+                     for machine_id in range(1, args.displays + 1)]
+            if args.reassign_interval:
+                tasks.append(run_console(session, args, stats, stop_at))
+        else:
+            tasks = [run_display(session, args, machine_id, stats, stop_at)
+                     for machine_id in range(1, args.displays + 1)]
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - started
+        queries_after = await get_query_count(session, args.url)
+
+    routes = {name: route.summary(duration) for name, route in sorted(stats.items())}
+    total = sum(route['requests'] for route in routes.values())
+    db_queries = None
+    if queries_before is not None and queries_after is not None:
+        db_queries = round((queries_after - queries_before) / duration, 2)
+    return {
+        'duration_s': round(duration, 2),
+        'requests': total,
+        'throughput_rps': round(total / duration, 2),
+        'errors': sum(route['errors'] for route in routes.values()),
+        'db_queries_per_s': db_queries,
+        'routes': routes,
+    }
+
+async def wait_until_ready(url, path='/api/pool_stats', timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{url}{path}") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None):
+    print(f"{'route':<38}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'304s':>7}{'errors':>8}{'events':>8}")
+    for name, route in results['routes'].items():
+        line = (f"{name:<38}{route['rps']:>9}{route['p50_ms'] or 0:>9}{route['p95_ms'] or 0:>9}"
+                f"{route['p99_ms'] or 0:>9}{route['not_modified']:>7}{route['errors']:>8}{route.get('events', 0):>8}")
+        previous = baseline['results']['routes'].get(name) if baseline else None
+        if previous and previous['p95_ms'] and route['p95_ms']:
+            line += f"   p95 {route['p95_ms'] - previous['p95_ms']:+.2f} ms vs baseline"
+        print(line)
+    print(f"throughput: {results['throughput_rps']} req/s, errors: {results['errors']}, "
+          f"DB queries: {results['db_queries_per_s']}/s")
+    if baseline:
+        print(f"baseline throughput: {baseline['results']['throughput_rps']} req/s "
+              f"({baseline.get('commit')}, {baseline['config']['displays']} displays)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate lab displays polling the API.")
+    parser.add_argument('--displays', type=int, default=50)
+    parser.add_argument('--mode', choices=['renderer', 'polling'], default='renderer',
+                        help="renderer: one event stream per display plus fallback polls; polling: the older renderer")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+    parser.add_argument('--db', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--url', help="Target an already running server instead of starting one")
+    parser.add_argument('--proxy-url', help="Where the /proxy routes are served (defaults to --url with --url, "
+                                            "else a proxy server started on --port + 1)")
+    parser.add_argument('--port', type=int, default=5055, help="Port for the server started by this script")
+    parser.add_argument('--gunicorn-threads', type=int,
+                        help="Start the server under gunicorn with this many threads, as in production")
+    parser.add_argument('--venues', type=int, default=20)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--upstream-latency', type=float, default=0.15)
+    parser.add_argument('--announcement-interval', type=float, default=1.0)
+    parser.add_argument('--venue-interval', type=float, default=1.5)
+    parser.add_argument('--tap-interval', type=float, default=30.0)
+    parser.add_argument('--fallback-interval', type=float, default=60.0, help="Renderer mode: seconds between fallback polls")
+    parser.add_argument('--reassign-interval', type=float, default=30.0,
+                        help="Renderer mode: seconds between console reassignments (0 disables)")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    servers = []
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        servers.append(subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, 'bench_server.py'),
+            '--port', str(args.port), '--db', args.db, '--machines', str(args.displays),
+            '--venues', str(args.venues), '--upstream-latency', str(args.upstream_latency),
+        ] + (['--gunicorn-threads', str(args.gunicorn_threads)] if args.gunicorn_threads else [])))
+        if not args.proxy_url:
+            args.proxy_url = f"http://127.0.0.1:{args.port + 1}"
+            servers.append(subprocess.Popen([
+                sys.executable, os.path.join(BENCH_DIR, 'bench_server.py'), '--proxy',
+                '--port', str(args.port + 1), '--upstream-latency', str(args.upstream_latency),
+            ]))
+    args.proxy_url = args.proxy_url or args.url
+
+    try:
+        asyncio.run(wait_until_ready(args.url))
+        if args.proxy_url != args.url:
+            asyncio.run(wait_until_ready(args.proxy_url, '/metrics'))
+        print(f"Running {args.displays} displays for {args.duration:.0f} s against {args.url} "
+              f"(proxy routes on {args.proxy_url})...")
+        results = asyncio.run(run_load(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
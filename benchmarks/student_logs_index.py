@@ -0,0 +1,111 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import mysql.connector  # Import MySQL connector
+
+# Benchmark for migration 1: time the recent-tap lookup on student_logs
+# before and after adding the (studID, time_arrived) index.
+# Runs against a scratch database (created if needed) filled with a synthetic log,
+# so it never touches maclab_db.
+#
+#   python benchmarks/student_logs_index.py --rows 1000000 --queries 200
+
+LOOKUP_QUERY = """
+    SELECT * FROM student_logs
+    WHERE studID = %s
+      AND time_arrived >= (%s - INTERVAL 1 MINUTE)
+"""
+
+def create_table(cursor):
+    cursor.execute("DROP TABLE IF EXISTS student_logs")
+    cursor.execute("""
+        CREATE TABLE student_logs (
+            id int(11) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            studID varchar(255) NOT NULL,
+            full_name varchar(255) NOT NULL,
+            instructor varchar(255) NOT NULL,
+            time_arrived datetime NOT NULL DEFAULT current_timestamp(),
+            yr_section varchar(255) NOT NULL,
+            lab_name varchar(255) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+    """)
+
+# Spread taps from a few thousand students over one semester
+def fill_table(connection, cursor, rows, students, batch_size=10000):
+    start = datetime.now() - timedelta(days=120)
+    insert = """
+        INSERT INTO student_logs (studID, full_name, instructor, yr_section, lab_name, time_arrived)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, rows)):
+            studID = f"2023-{random.randrange(students):05d}"
+            time_arrived = start + timedelta(seconds=i * 120 * 86400 // rows)
+            batch.append((studID, "Juan Dela Cruz", "Instructor", "BSCS 3A", "MacLab", time_arrived))
+        cursor.executemany(insert, batch)
+        connection.commit()
+
+def time_lookups(cursor, queries, students):
+    now = datetime.now()
+    timings = []
+    for _ in range(queries):
+        studID = f"2023-{random.randrange(students):05d}"
+        started = time.perf_counter()
+        cursor.execute(LOOKUP_QUERY, (studID, now))
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'p50': timings[len(timings) // 2],
+        'p95': timings[int(len(timings) * 0.95) - 1],
+        'max': timings[-1],
+    }
+
+def explain(cursor):
+    cursor.execute("EXPLAIN " + LOOKUP_QUERY, ("2023-00001", datetime.now()))
+    row = cursor.fetchone()
+    return f"type={row['type']} key={row['key']} rows={row['rows']}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the student_logs (studID, time_arrived) index.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='maclab_bench')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--students', type=int, default=3000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(host=args.host, user=args.user, password=args.password)
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+    cursor.execute(f"USE `{args.database}`")
+
+    print(f"Filling student_logs with {args.rows} rows...")
+    create_table(cursor)
+    fill_table(connection, cursor, args.rows, args.students)
+    cursor.execute("ANALYZE TABLE student_logs")
+    cursor.fetchall()
+
+    before = time_lookups(cursor, args.queries, args.students)
+    before_plan = explain(cursor)
+
+    cursor.execute("ALTER TABLE student_logs ADD INDEX idx_student_logs_stud_time (studID, time_arrived)")
+    cursor.execute("ANALYZE TABLE student_logs")
+    cursor.fetchall()
+
+    after = time_lookups(cursor, args.queries, args.students)
+    after_plan = explain(cursor)
+
+    print(f"{'':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}  plan")
+    for label, result, plan in (('no index', before, before_plan), ('with index', after, after_plan)):
+        print(f"{label:<14}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['max']:>10.2f}  {plan}")
+
+    cursor.close()
+    connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import collections
+import gzip
+import hashlib
+import os
+import threading
+from flask import request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Negotiated gzip/Brotli compression for JSON and text responses. Compressed bodies
+# are cached under the response's ETag (or a hash of the body), so displays that poll
+# unchanged content are answered from the cache instead of recompressing it.
+# main.py calls install(app); proxy_server.py uses choose_encoding() and compress().
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))  # Smaller bodies are sent as is
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESSION_CACHE_BYTES = int(os.getenv('COMPRESSION_CACHE_BYTES', 32 * 1024 * 1024))
+COMPRESSIBLE_TYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript'}
+
+compression_cache = collections.OrderedDict()  # (key, encoding) -> compressed body
+compression_cache_bytes = 0
+compression_cache_lock = threading.Lock()
+
+# Pick br or gzip from an Accept-Encoding header, or None to send the body uncompressed
+def choose_encoding(accept_encoding):
+    accepted = parse_accept_header(accept_encoding or '')
+    for encoding in ('br', 'gzip') if brotli else ('gzip',):
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+# key identifies the uncompressed body, e.g. its ETag
+def compress(body, encoding, key):
+    global compression_cache_bytes
+    cache_key = (key, encoding)
+    with compression_cache_lock:
+        compressed = compression_cache.get(cache_key)
+        if compressed is not None:
+            compression_cache.move_to_end(cache_key)
+            return compressed
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+    with compression_cache_lock:
+        if cache_key not in compression_cache and len(compressed) <= COMPRESSION_CACHE_BYTES:
+            compression_cache[cache_key] = compressed
+            compression_cache_bytes += len(compressed)
+            while compression_cache_bytes > COMPRESSION_CACHE_BYTES:
+                _, evicted = compression_cache.popitem(last=False)
+                compression_cache_bytes -= len(evicted)
+    return compressed
+
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    etag, _ = response.get_etag()
+    response.set_data(compress(body, encoding, etag or hashlib.sha1(body).hexdigest()))
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # The bytes differ per encoding, so the tag becomes weak; If-None-Match still matches it
+        response.set_etag(etag, weak=True)
+    return response
+
+def install(app):
+    # Must be registered before the ETag hook so it runs after it, on the final uncompressed body
+    app.after_request(compress_response)
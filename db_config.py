@@ -0,0 +1,12 @@
+import os
+from dotenv import load_dotenv  # Import dotenv
+
+# Database settings shared by main.py and migrations.py (can be overridden from .env)
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'maclab_db'),
+}
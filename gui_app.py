@@ -1,58 +1,274 @@
 import sys
 import asyncio
+import collections
+import itertools
+import json
+import threading
+import time
 import websockets
-import base64
+import mimetypes
 import requests
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QGroupBox, QLineEdit, QPushButton, QLabel, QComboBox, QRadioButton, QButtonGroup, QMessageBox, QFileDialog, QWidget, QDialog
 )
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import QThread, Signal, QObject, QRunnable, QThreadPool, Slot
+
+API_URL = "http://localhost:5000"
+API_TIMEOUT = (3, 30)  # Connect and read timeouts in seconds
+
+
+class RequestSignals(QObject):
+    finished = Signal(object, bool, object)  # request, succeeded, response or error message
+
+
+class ApiRequest(QRunnable):
+    """One HTTP call, run on the API thread pool."""
+
+    local = threading.local()  # One keep-alive session per pool thread
+
+    def __init__(self, method, path, on_success, on_error, key=None, upload_path=None, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # ApiClient keeps the reference and may still cancel it
+        self.method = method
+        self.path = path
+        self.on_success = on_success
+        self.on_error = on_error
+        self.key = key
+        self.upload_path = upload_path
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.signals = RequestSignals()
+
+    def run(self):
+        if self.cancelled:
+            return
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        try:
+            if self.upload_path:
+                # The file is streamed, not loaded into memory
+                with open(self.upload_path, "rb") as upload_file:
+                    response = session.request(self.method, API_URL + self.path, data=upload_file, timeout=API_TIMEOUT, **self.kwargs)
+            else:
+                response = session.request(self.method, API_URL + self.path, timeout=API_TIMEOUT, **self.kwargs)
+        except (requests.exceptions.RequestException, OSError) as e:
+            self.signals.finished.emit(self, False, str(e))
+            return
+        self.signals.finished.emit(self, True, response)
+
+
+class ApiClient(QObject):
+    """Runs API calls off the GUI thread and delivers their results on it.
+
+    A request made with a key replaces any unfinished request with the same key,
+    whose result is then dropped.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(4)
+        self.pending = {}  # key -> ApiRequest
+        self.running = set()  # Keeps requests alive until they report back
+
+    def request(self, method, path, on_success, on_error, key=None, **kwargs):
+        if key is not None:
+            self.cancel(key)
+        request = ApiRequest(method, path, on_success, on_error, key=key, **kwargs)
+        request.signals.finished.connect(self.deliver)  # Queued: the slot runs on the GUI thread
+        if key is not None:
+            self.pending[key] = request
+        self.running.add(request)
+        self.pool.start(request)
+        return request
+
+    def cancel(self, key):
+        request = self.pending.pop(key, None)
+        if request is not None:
+            request.cancelled = True
+            if self.pool.tryTake(request):  # Not started yet
+                self.running.discard(request)
+
+    @Slot(object, bool, object)
+    def deliver(self, request, succeeded, result):
+        self.running.discard(request)
+        if request.key is not None and self.pending.get(request.key) is request:
+            del self.pending[request.key]
+        if request.cancelled:
+            return
+        if succeeded:
+            request.on_success(result)
+        else:
+            request.on_error(result)
+
+
+class ChangeFeedListener(QThread):
+    """Follows the backend's /api/events stream and reports the type of each event."""
+
+    event_received = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.running = True
+        self.response = None
+
+    def run(self):
+        while self.running:
+            try:
+                self.response = requests.get(API_URL + "/api/events", stream=True, timeout=(3, 60))
+                for line in self.response.iter_lines(decode_unicode=True):
+                    if not self.running:
+                        break
+                    if line and line.startswith("event:"):
+                        self.event_received.emit(line[len("event:"):].strip())
+            except Exception as e:
+                if self.running:
+                    print(f"Change feed disconnected: {e}")
+            if self.running:
+                self.msleep(3000)  # Reconnect after 3 seconds
+
+    def stop(self):
+        self.running = False
+        if self.response is not None:
+            self.response.close()
+
+
+class LabModel:
+    """Machines, venues and venue assignments, loaded once and refreshed on change."""
+
+    def __init__(self):
+        self.machines = []
+        self.venues = []
+        self.assignments = {}  # machineID -> VenueID
+        self.assignments_loaded = False
+
+    def set_assignments(self, rows):
+        self.assignments = {row["machineID"]: row["VenueID"] for row in rows}
+        self.assignments_loaded = True
+
+    def has_machine_name(self, name):
+        return any(machine["machineName"].lower() == name.lower() for machine in self.machines)
 
 
 class WebSocketClient(QThread):
+    """Keeps the connection to the display command hub and sends commands over it.
+
+    send_message() can be called from any thread: it queues the command and returns its id.
+    The client's own event loop sends queued commands in order, and holds them while the
+    connection is down so they are replayed when it returns. Commands older than
+    COMMAND_MAX_AGE, or pushed out of a full queue, are reported as failed instead.
+    The hub acknowledges each command with the number of displays it was routed to.
+    """
+
     message_received = Signal(str)  # Signal to send messages to the GUI
+    message_sent = Signal(int, str)  # Command id and text, once written to the server
+    message_delivered = Signal(int, int)  # Command id and number of displays the hub routed it to
+    message_failed = Signal(int, str, str)  # Command id, text and reason
+    connection_changed = Signal(bool)
+
+    OUTBOX_SIZE = 100
+    COMMAND_MAX_AGE = 60  # Seconds a command may wait for the connection
+    RECONNECT_DELAY = 1  # Seconds
 
     def __init__(self, uri):
         super().__init__()
         self.uri = uri
         self.running = True
-        self.websocket = None
+        self.loop = None
+        self.wakeup = None  # Set when a command is queued or the client is stopping
+        self.outbox = collections.deque()  # (id, message, frame, queued_at); deque appends and pops are thread-safe
+        self.ids = itertools.count(1)
+
+    async def send_queued(self, websocket):
+        while True:
+            # Take the command off the queue before sending it: send_message() may trim the
+            # queue from the GUI thread meanwhile, and must not drop the command being sent
+            while self.outbox:
+                command = self.outbox.popleft()
+                message_id, message, frame, queued_at = command
+                if time.monotonic() - queued_at > self.COMMAND_MAX_AGE:
+                    self.message_failed.emit(message_id, message, "Timed out waiting for the server.")
+                    continue
+                try:
+                    await websocket.send(frame)
+                except BaseException:
+                    self.outbox.appendleft(command)  # Not sent: keep it first in line for the next connection
+                    raise
+                self.message_sent.emit(message_id, message)
+            self.wakeup.clear()
+            if not self.running:
+                return
+            await self.wakeup.wait()
+
+    async def receive(self, websocket):
+        async for message in websocket:
+            try:
+                data = json.loads(message)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and data.get("type") == "ack":
+                self.message_delivered.emit(data["id"], data.get("delivered", 0))
+            else:
+                self.message_received.emit(message)
 
     async def connect(self):
         try:
             async with websockets.connect(self.uri) as websocket:
-                self.websocket = websocket
-                while self.running:
-                    try:
-                        message = await websocket.recv()
-                        self.message_received.emit(message)
-                    except Exception as e:
-                        print(f"Error receiving message: {e}")
-                        break
+                self.connection_changed.emit(True)
+                tasks = [asyncio.create_task(self.receive(websocket)), asyncio.create_task(self.send_queued(websocket))]
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                for task in done:
+                    if not task.cancelled() and task.exception():
+                        print(f"WebSocket error: {task.exception()}")
+            self.connection_changed.emit(False)
         except Exception as e:
             print(f"Failed to connect to WebSocket server: {e}")
 
-    def run(self):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def main(self):
+        self.wakeup = asyncio.Event()
         while self.running:
-            loop.run_until_complete(self.connect())
+            await self.connect()
             if self.running:
-                print("WebSocket disconnected. Reconnecting in 3 seconds...")
-                loop.run_until_complete(asyncio.sleep(3))
+                print(f"WebSocket disconnected. Reconnecting in {self.RECONNECT_DELAY} second(s)...")
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.RECONNECT_DELAY)  # stop() cuts the wait short
+                except asyncio.TimeoutError:
+                    pass
 
-    def send_message(self, message):
-        try:
-            if self.websocket:
-                asyncio.run(self.websocket.send(message))
-            else:
-                print("WebSocket is not connected.")
-        except Exception as e:
-            print(f"Error sending message: {e}")
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.main())
+        self.loop.close()
+
+    def notify(self):
+        loop = self.loop
+        if loop is not None and self.wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.wakeup.set)
+
+    def send_message(self, message, target=None):
+        """Queue a command and return its id; message_sent or message_failed follows.
+
+        target limits the displays it goes to, e.g. {"machines": [3]} or {"venues": [2]};
+        without one every display gets it.
+        """
+        message_id = next(self.ids)
+        frame = json.dumps({"type": "command", "id": message_id, "command": message, "target": target})
+        self.outbox.append((message_id, message, frame, time.monotonic()))
+        while len(self.outbox) > self.OUTBOX_SIZE:
+            dropped_id, dropped, _, _ = self.outbox.popleft()
+            self.message_failed.emit(dropped_id, dropped, "Too many commands waiting for the server.")
+        self.notify()
+        return message_id
 
     def stop(self):
         self.running = False
-        self.quit()
+        self.notify()
+        self.wait(2000)
 
 
 class MainWindow(QMainWindow):
@@ -61,6 +277,10 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Lab Display Remote Control")
         self.setGeometry(100, 100, 600, 600)
 
+        # API calls run on a thread pool; the model keeps what they loaded
+        self.api = ApiClient(self)
+        self.model = LabModel()
+
         # Main layout
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -72,9 +292,21 @@ class MainWindow(QMainWindow):
         self.add_announcement_form_section()
 
         # WebSocket client
+        self.command_labels = {}  # Command id -> button label, until the hub acknowledges it or it fails
         self.websocket_client = WebSocketClient("ws://localhost:8770")
+        self.websocket_client.message_sent.connect(self.on_command_sent)
+        self.websocket_client.message_delivered.connect(self.on_command_delivered)
+        self.websocket_client.message_failed.connect(self.on_command_failed)
+        self.websocket_client.connection_changed.connect(self.on_connection_changed)
         self.websocket_client.start()
 
+        # Reload the model when another console (or this one) changes machines or assignments
+        self.change_feed = ChangeFeedListener()
+        self.change_feed.event_received.connect(self.on_change_event)
+        self.change_feed.start()
+
+        self.load_model()
+
     def add_update_venue_section(self):
         """Create the Update Venue form section."""
         update_venue_group = QGroupBox("Update Venue")
@@ -112,8 +344,7 @@ class MainWindow(QMainWindow):
         # Connect button to action
         self.update_venue_button.clicked.connect(self.update_venue)
 
-        # Fetch data for dropdowns
-        self.fetch_machines()
+        # Selecting a machine shows its venue from the model, without a request
         self.machine_dropdown.currentIndexChanged.connect(self.update_venue_dropdown)
 
         update_venue_group.setLayout(update_venue_layout)
@@ -124,6 +355,13 @@ class MainWindow(QMainWindow):
         display_change_group = QGroupBox("Display Change Buttons")
         display_change_layout = QHBoxLayout()
 
+        # Which displays the commands go to
+        self.command_target_dropdown = QComboBox()
+        self.command_target_dropdown.addItem("All displays", "all")
+        self.command_target_dropdown.addItem("Selected machine", "machine")
+        self.command_target_dropdown.addItem("Selected venue", "venue")
+        display_change_layout.addWidget(self.command_target_dropdown)
+
         # Buttons for specific actions
         self.schedule_button = QPushButton("Show Current Schedule")
         self.image_button = QPushButton("Show Plotting")
@@ -188,67 +426,96 @@ class MainWindow(QMainWindow):
         announcement_group.setLayout(announcement_layout)
         self.main_layout.addWidget(announcement_group)
 
+    def load_model(self):
+        """Load machines, venues and assignments in parallel."""
+        self.fetch_machines()
+        self.fetch_venues()
+        self.fetch_assignments()
+
+    def on_change_event(self, event_type):
+        """Refresh the parts of the model a change-feed event affects."""
+        if event_type == "machines_changed":
+            self.fetch_machines()
+            self.fetch_assignments()  # Deleting a machine also removes its assignment
+        elif event_type == "venue_reassigned":
+            self.fetch_assignments()
+        elif event_type == "resync":
+            self.load_model()
+
     def fetch_machines(self):
         """Fetch machines from the API and populate the machine dropdown."""
-        try:
-            response = requests.get("http://localhost:5000/api/pc")
-            if response.status_code == 200:
-                machines = response.json()
-                self.machine_dropdown.clear()
-                for machine in machines:
-                    # Add machineName and machineID to the dropdown
-                    self.machine_dropdown.addItem(f"{machine['machineName']} (ID: {machine['machineID']})", machine['machineID'])
-                # Trigger venue dropdown update for the first machine
-                self.update_venue_dropdown()
-            else:
-                self.show_popup_message(f"Error fetching machines: {response.text}", success=False)
-        except Exception as e:
-            self.show_popup_message(f"Error fetching machines: {e}", success=False)
+        self.api.request("GET", "/api/pc", self.on_machines_loaded, self.on_fetch_error("machines"), key="machines")
+
+    def on_machines_loaded(self, response):
+        if response.status_code != 200:
+            self.show_popup_message(f"Error fetching machines: {response.text}", success=False)
+            return
+        self.model.machines = response.json()
+
+        # Rebuild the list without firing a selection change per item, then restore the selection
+        selected_machine_id = self.machine_dropdown.currentData()
+        self.machine_dropdown.blockSignals(True)
+        self.machine_dropdown.clear()
+        for machine in self.model.machines:
+            # Add machineName and machineID to the dropdown
+            self.machine_dropdown.addItem(f"{machine['machineName']} (ID: {machine['machineID']})", machine['machineID'])
+        self.machine_dropdown.setCurrentIndex(max(0, self.machine_dropdown.findData(selected_machine_id)))
+        self.machine_dropdown.blockSignals(False)
+        self.update_venue_dropdown()
 
     def fetch_venues(self):
         """Fetch venues from the API and populate the venue dropdown."""
-        try:
-            response = requests.get("http://localhost:5000/api/venues")
-            if response.status_code == 200:
-                venues = response.json()
-                self.venue_dropdown.clear()
-                for venue in venues:
-                    # Add VenueDesc and VenueID to the dropdown
-                    self.venue_dropdown.addItem(f"{venue['VenueDesc']} (ID: {venue['VenueID']})", venue['VenueID'])
-            else:
-                self.show_popup_message(f"Error fetching venues: {response.text}", success=False)
-        except Exception as e:
-            self.show_popup_message(f"Error fetching venues: {e}", success=False)
+        self.api.request("GET", "/api/venues", self.on_venues_loaded, self.on_fetch_error("venues"), key="venues")
+
+    def on_venues_loaded(self, response):
+        if response.status_code != 200:
+            self.show_popup_message(f"Error fetching venues: {response.text}", success=False)
+            return
+        self.model.venues = response.json()
+        self.venue_dropdown.clear()
+        for venue in self.model.venues:
+            # Add VenueDesc and VenueID to the dropdown
+            self.venue_dropdown.addItem(f"{venue['VenueDesc']} (ID: {venue['VenueID']})", venue['VenueID'])
+        self.update_venue_dropdown()
+
+    def fetch_assignments(self):
+        """Fetch every machine's venue assignment."""
+        self.api.request("GET", "/api/pctovenue", self.on_assignments_loaded, self.on_fetch_error("assigned venues"), key="assignments")
+
+    def on_assignments_loaded(self, response):
+        if response.status_code != 200:
+            self.show_popup_message(f"Error fetching assigned venues: {response.text}", success=False)
+            return
+        self.model.set_assignments(response.json())
+        self.update_venue_dropdown()
+
+    def on_fetch_error(self, what):
+        return lambda error: self.show_popup_message(f"Error fetching {what}: {error}", success=False)
 
     def update_venue_dropdown(self):
         """Update the venue dropdown based on the selected machine."""
+        self.api.cancel("machine_venue")  # A lookup for the previous selection is no longer needed
         selected_machine_id = self.machine_dropdown.currentData()
         if not selected_machine_id:
             return
 
-        # Fetch assigned venue for the selected machine
-        try:
-            response = requests.get("http://localhost:5000/api/pctovenue")
-            if response.status_code == 200:
-                assigned_venues = response.json()
-                assigned_venue_id = None
-
-                # Find the assigned venue for the selected machine
-                for item in assigned_venues:
-                    if item["machineID"] == selected_machine_id:
-                        assigned_venue_id = item["VenueID"]
-                        break
+        if self.model.assignments_loaded:
+            self.select_venue(self.model.assignments.get(selected_machine_id))
+        else:
+            # Assignments are still loading; look up just this machine
+            self.api.request(
+                "GET", f"/api/pctovenue/{selected_machine_id}",
+                lambda response: self.select_venue(response.json().get("VenueID") if response.status_code == 200 else None),
+                lambda error: None,
+                key="machine_venue",
+            )
 
-                # Fetch all venues and set the default selection
-                self.fetch_venues()
-                if assigned_venue_id:
-                    index = self.venue_dropdown.findData(assigned_venue_id)
-                    if index != -1:
-                        self.venue_dropdown.setCurrentIndex(index)
-            else:
-                self.show_popup_message(f"Error fetching assigned venues: {response.text}", success=False)
-        except Exception as e:
-            self.show_popup_message(f"Error fetching assigned venues: {e}", success=False)
+    def select_venue(self, venue_id):
+        """Select the given venue in the venue dropdown, if it is listed."""
+        if venue_id:
+            index = self.venue_dropdown.findData(venue_id)
+            if index != -1:
+                self.venue_dropdown.setCurrentIndex(index)
 
     def update_venue(self):
         """Send a PUT request to update the venue ID for a machine."""
@@ -259,17 +526,23 @@ class MainWindow(QMainWindow):
             self.show_popup_message("Error: Both Machine and Venue must be selected.", success=False)
             return
 
-        try:
-            response = requests.put(
-                "http://localhost:5000/api/update_venue",
-                json={"machineID": machine_id, "VenueID": venue_id},
-            )
+        def on_success(response):
+            self.update_venue_button.setEnabled(True)
             if response.status_code == 200:
+                self.model.assignments[machine_id] = venue_id
                 self.show_popup_message("Venue updated successfully.")
             else:
                 self.show_popup_message(f"Error updating venue: {response.text}", success=False)
-        except Exception as e:
-            self.show_popup_message(f"Error sending request: {e}", success=False)
+
+        def on_error(error):
+            self.update_venue_button.setEnabled(True)
+            self.show_popup_message(f"Error sending request: {error}", success=False)
+
+        self.update_venue_button.setEnabled(False)
+        self.api.request(
+            "PUT", "/api/update_venue", on_success, on_error,
+            json={"machineID": machine_id, "VenueID": venue_id},
+        )
 
     def update_form_visibility(self):
         """Update the visibility of the form fields based on the selected radio button."""
@@ -291,32 +564,52 @@ class MainWindow(QMainWindow):
         msg_box.setText(message)
         msg_box.exec()
 
+    def command_target(self):
+        """The hub target for the chosen displays, or None for all of them."""
+        choice = self.command_target_dropdown.currentData()
+        if choice == "machine" and self.machine_dropdown.currentData():
+            return {"machines": [self.machine_dropdown.currentData()]}
+        if choice == "venue" and self.venue_dropdown.currentData():
+            return {"venues": [self.venue_dropdown.currentData()]}
+        return None
+
+    def send_display_command(self, message, label):
+        """Queue a display command; the status bar reports when it reaches the server."""
+        message_id = self.websocket_client.send_message(message, self.command_target())
+        self.command_labels[message_id] = label
+        self.statusBar().showMessage(f"Sending: {label}...")
+
+    def on_command_sent(self, message_id, message):
+        label = self.command_labels.get(message_id, message)
+        self.statusBar().showMessage(f"Sent: {label}", 5000)
+
+    def on_command_delivered(self, message_id, delivered):
+        label = self.command_labels.pop(message_id, None)
+        if label is not None:
+            self.statusBar().showMessage(f"{label}: sent to {delivered} display(s)", 5000)
+
+    def on_command_failed(self, message_id, message, reason):
+        label = self.command_labels.pop(message_id, message)
+        self.statusBar().clearMessage()
+        self.show_popup_message(f"Could not send \"{label}\": {reason}", success=False)
+
+    def on_connection_changed(self, connected):
+        if connected:
+            self.statusBar().showMessage("Connected to the display server.", 3000)
+        else:
+            self.statusBar().showMessage("Display server disconnected; commands will be sent when it is back.")
+
     def send_schedule_message(self):
         # Send a message to display the current schedule
-        message = "show_schedule"
-        try:
-            self.websocket_client.send_message(message)
-            self.show_popup_message("Sent: Show Current Schedule")
-        except Exception as e:
-            self.show_popup_message(f"Error: {e}", success=False)
+        self.send_display_command("show_schedule", "Show Current Schedule")
 
     def send_image_message(self):
         # Send a message to display an image
-        message = "show_image"
-        try:
-            self.websocket_client.send_message(message)
-            self.show_popup_message("Sent: Show Plotting")
-        except Exception as e:
-            self.show_popup_message(f"Error: {e}", success=False)
+        self.send_display_command("show_image", "Show Plotting")
 
     def send_announcement_message(self):
         # Send a message to display an announcement
-        message = "show_announcement"
-        try:
-            self.websocket_client.send_message(message)
-            self.show_popup_message("Sent: Show Announcement")
-        except Exception as e:
-            self.show_popup_message(f"Error: {e}", success=False)
+        self.send_display_command("show_announcement", "Show Announcement")
 
     def upload_image(self):
         # Open a file dialog to select an image
@@ -326,6 +619,17 @@ class MainWindow(QMainWindow):
 
     def submit_announcement(self):
         # Determine if the announcement is text or image
+        def on_success(response, expected_status):
+            self.submit_button.setEnabled(True)
+            if response.status_code == expected_status:
+                self.show_popup_message("Announcement updated successfully.")
+            else:
+                self.show_popup_message(f"Error updating announcement: {response.text}", success=False)
+
+        def on_error(error):
+            self.submit_button.setEnabled(True)
+            self.show_popup_message(f"Error sending request: {error}", success=False)
+
         if self.text_radio.isChecked():
             content = self.announcement_input.text()
             is_image = 0
@@ -334,30 +638,24 @@ class MainWindow(QMainWindow):
             if file_path == "No image selected":
                 self.show_popup_message("Error: No image selected.", success=False)
                 return
-            try:
-                # Convert the image to base64
-                with open(file_path, "rb") as image_file:
-                    content = base64.b64encode(image_file.read()).decode('utf-8')
-                is_image = 1
-            except Exception as e:
-                self.show_popup_message(f"Error reading image: {e}", success=False)
-                return
+            # Upload the raw image bytes
+            self.submit_button.setEnabled(False)
+            self.api.request(
+                "POST", "/api/announcement/image", lambda response: on_success(response, 201), on_error,
+                upload_path=file_path,
+                headers={"Content-Type": mimetypes.guess_type(file_path)[0] or "application/octet-stream"},
+            )
+            return
         else:
             self.show_popup_message("Error: Invalid announcement type.", success=False)
             return
 
         # Send the PUT request to update the announcement
-        try:
-            response = requests.put(
-                "http://localhost:5000/api/announcement",
-                json={"content": content, "isImage": is_image},
-            )
-            if response.status_code == 200:
-                self.show_popup_message("Announcement updated successfully.")
-            else:
-                self.show_popup_message(f"Error updating announcement: {response.text}", success=False)
-        except Exception as e:
-            self.show_popup_message(f"Error sending request: {e}", success=False)
+        self.submit_button.setEnabled(False)
+        self.api.request(
+            "PUT", "/api/announcement", lambda response: on_success(response, 200), on_error,
+            json={"content": content, "isImage": is_image},
+        )
 
     def show_add_pc_dialog(self):
         from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel
@@ -382,34 +680,26 @@ class MainWindow(QMainWindow):
                 return
 
             # Check if PC name already exists
-            try:
-                response = requests.get("http://localhost:5000/api/pc")
-                if response.status_code == 200:
-                    machines = response.json()
-                    if any(machine['machineName'].lower() == pc_name.lower() for machine in machines):
-                        self.show_popup_message("PC name already exists.", success=False)
-                        return
-                else:
-                    self.show_popup_message(f"Error checking existing PCs: {response.text}", success=False)
-                    return
-            except Exception as e:
-                self.show_popup_message(f"Error checking existing PCs: {e}", success=False)
+            if self.model.has_machine_name(pc_name):
+                self.show_popup_message("PC name already exists.", success=False)
                 return
 
-            # Proceed to add if not exists
-            try:
-                response = requests.post(
-                    "http://localhost:5000/api/pc",
-                    json={"machineName": pc_name},
-                )
+            def on_success(response):
+                submit_btn.setEnabled(True)
                 if response.status_code == 201:
                     self.show_popup_message("PC added successfully.")
                     self.fetch_machines()  # Refresh the dropdown
                     dialog.accept()
                 else:
                     self.show_popup_message(f"Error adding PC: {response.text}", success=False)
-            except Exception as e:
-                self.show_popup_message(f"Error sending request: {e}", success=False)
+
+            def on_error(error):
+                submit_btn.setEnabled(True)
+                self.show_popup_message(f"Error sending request: {error}", success=False)
+
+            # Proceed to add if not exists
+            submit_btn.setEnabled(False)
+            self.api.request("POST", "/api/pc", on_success, on_error, json={"machineName": pc_name})
 
         submit_btn.clicked.connect(submit)
         dialog.exec()
@@ -432,18 +722,24 @@ class MainWindow(QMainWindow):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            try:
-                response = requests.delete(f"http://localhost:5000/api/pc/{machine_id}")
+            def on_success(response):
+                self.delete_pc_button.setEnabled(True)
                 if response.status_code == 200:
                     self.show_popup_message("PC deleted successfully.")
                     self.fetch_machines()  # Refresh the dropdown
                 else:
                     self.show_popup_message(f"Error deleting PC: {response.text}", success=False)
-            except Exception as e:
-                self.show_popup_message(f"Error sending delete request: {e}", success=False)
+
+            def on_error(error):
+                self.delete_pc_button.setEnabled(True)
+                self.show_popup_message(f"Error sending delete request: {error}", success=False)
+
+            self.delete_pc_button.setEnabled(False)
+            self.api.request("DELETE", f"/api/pc/{machine_id}", on_success, on_error)
 
     def closeEvent(self, event):
         self.websocket_client.stop()
+        self.change_feed.stop()
         super().closeEvent(event)
 
 
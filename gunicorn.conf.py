@@ -0,0 +1,50 @@
+import os
+
+# Production server settings for the Flask API in main.py
+#
+#   pip install gunicorn
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# Graceful reload (new code or settings, no dropped requests): kill -HUP <master pid>
+# Graceful shutdown: kill -TERM <master pid>
+# See "Backend server" in README.md for how to size workers and threads.
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+
+# main.py keeps the reference cache, the change feed (/api/events) and the student log
+# queue in process memory. Events published in one worker only reach displays streaming
+# from that worker, so run a single worker process and scale with threads.
+workers = int(os.getenv('WEB_WORKERS', 1))
+worker_class = 'gthread'
+
+# Each display keeps one /api/events stream open, and each open stream occupies a thread.
+# Size this to the number of displays and admin consoles plus headroom for ordinary requests.
+threads = int(os.getenv('WEB_THREADS', 128))
+
+# Worker recycling: replace a worker after this many requests to cap memory growth.
+# The jitter keeps several workers from restarting at the same moment.
+# Off by default with a single worker: gunicorn only starts the replacement once the old
+# worker has exited, and the old worker waits graceful_timeout for its /api/events streams,
+# which never finish on their own. Every display would stall for that long at each recycle,
+# and the caches, the dedupe window and the class timeline would start over.
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 20000 if workers > 1 else 0))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 2000))
+
+# On reload/shutdown, in-flight requests get this long to finish. Open event streams never
+# finish, so they are cut when it runs out and the displays reconnect and resync on their own.
+# A HUP reload starts the new worker first, so only a full shutdown waits out this timeout
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 15))
+timeout = int(os.getenv('WEB_TIMEOUT', 60))  # Restart a worker that stops responding for this long
+
+# Keep-alive profile: displays and the admin console reconnect to the same server all day,
+# so keep idle connections open well past their request interval
+keepalive = int(os.getenv('WEB_KEEPALIVE', 75))
+backlog = 2048
+
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Replay student logs spilled before a restart without waiting for the first request
+def post_worker_init(worker):
+    import main
+    main.ensure_student_log_flusher()
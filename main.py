@@ -1,41 +1,684 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, send_file, abort, Response
 from flask_cors import CORS  # Import CORS
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import threading
+import time
+import re
+import io
+import hashlib
+import tempfile
+import json
+import bisect
+import collections
+import uuid
+import atexit
+from datetime import datetime, timedelta
 import mysql.connector  # Import MySQL connector
+from mysql.connector import pooling  # Import MySQL connection pooling
 from dotenv import load_dotenv  # Import dotenv
 import base64  # Import base64 for encoding BLOB data
+import metrics
+import compression
+import renditions
+import migrations
+from db_config import DB_CONFIG
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+app.json.compact = True  # No indentation or spaces after separators, even in debug mode
+metrics.install(app)  # Request, query and upstream timings at GET /metrics
+
+# Database settings (DB_CONFIG lives in db_config.py so migrations.py can share it)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))  # mysql-connector allows at most 32
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # Seconds to wait for a free connection
+
+# Shared connection pool, created on first use so the app can start before MySQL is up
+db_pool = None
+db_pool_lock = threading.Lock()
+db_pool_slots = threading.BoundedSemaphore(DB_POOL_SIZE)  # Lets requests wait instead of failing on "pool exhausted"
+db_pool_stats = {
+    'size': DB_POOL_SIZE,
+    'in_use': 0,
+    'max_in_use': 0,
+    'checkouts': 0,
+    'timeouts': 0,
+    'wait_total_ms': 0.0,
+    'wait_max_ms': 0.0,
+}
+
+# Raised instead of using a database that migrations.py has not brought up to date. Routes
+# such as /api/update_venue rely on keys the migrations add, and without them they would
+# quietly write duplicate rows. An OperationalError, so queued student logs wait on disk
+class SchemaOutOfDate(mysql.connector.errors.OperationalError):
+    pass
+
+schema_is_current = False  # Set once the first connection finds no pending migrations
+schema_warning_printed = False
+
+def check_schema(connection):
+    global schema_is_current, schema_warning_printed
+    cursor = connection.cursor()
+    pending = migrations.get_pending_versions(cursor)
+    cursor.close()
+    if pending:
+        message = (f"Database schema is out of date: run `python migrations.py` "
+                   f"(pending migrations: {', '.join(str(version) for version in pending)}).")
+        if not schema_warning_printed:
+            print(f"ERROR: {message} Database requests will fail until then.")
+            schema_warning_printed = True
+        raise SchemaOutOfDate(msg=message)
+    schema_is_current = True
+
+def get_db_pool():
+    global db_pool
+    with db_pool_lock:
+        if db_pool is None:
+            db_pool = pooling.MySQLConnectionPool(
+                pool_name="maclab_pool",
+                pool_size=DB_POOL_SIZE,
+                pool_reset_session=True,
+                **DB_CONFIG
+            )
+        return db_pool
 
 # Database connection function
+# Checks a connection out of the pool once per request; it is returned in release_db_connection()
 def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="maclab_db"
+    if 'db_connection' in g:
+        return g.db_connection
+
+    # Wait for a free slot and record how long it took
+    wait_start = time.perf_counter()
+    if not db_pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        with db_pool_lock:
+            db_pool_stats['timeouts'] += 1
+        raise mysql.connector.errors.PoolError('Timed out waiting for a database connection.')
+    wait_ms = (time.perf_counter() - wait_start) * 1000
+
+    try:
+        # The pool reconnects a connection the server dropped while it sat idle, and puts it
+        # back in the queue if that fails, so a failed checkout never loses a pooled connection
+        connection = get_db_pool().get_connection()
+    except Exception:
+        db_pool_slots.release()
+        raise
+    metrics.observe_connection_acquire(time.perf_counter() - wait_start)
+
+    with db_pool_lock:
+        db_pool_stats['checkouts'] += 1
+        db_pool_stats['in_use'] += 1
+        db_pool_stats['max_in_use'] = max(db_pool_stats['max_in_use'], db_pool_stats['in_use'])
+        db_pool_stats['wait_total_ms'] += wait_ms
+        db_pool_stats['wait_max_ms'] = max(db_pool_stats['wait_max_ms'], wait_ms)
+
+    g.db_connection = metrics.instrument_connection(connection)
+    if not schema_is_current:
+        check_schema(g.db_connection)  # Checked again on each request until the migrations are applied
+    return g.db_connection
+
+# Return the request's connection to the pool, rolling back anything left uncommitted
+@app.teardown_appcontext
+def release_db_connection(exception):
+    connection = g.pop('db_connection', None)
+    if connection is None:
+        return
+    try:
+        if exception is not None:
+            connection.rollback()
+    except mysql.connector.Error:
+        pass
+    finally:
+        try:
+            connection.close()  # Pooled connections go back to the pool on close()
+        except mysql.connector.Error:
+            pass
+        db_pool_slots.release()
+        with db_pool_lock:
+            db_pool_stats['in_use'] -= 1
+
+# Conditional GET support: tag every successful GET response with a content-hash ETag
+# and answer a matching If-None-Match with 304 Not Modified (no body)
+# after_request hooks run in reverse order: the ETag is added, the body is compressed
+# (which makes the tag weak), and only then is the 304 decided, so it carries the same
+# validator and Vary header as the 200 it stands for
+@app.after_request
+def answer_conditional_request(response):
+    if request.method != 'GET' or response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return response
+    return response.make_conditional(request)
+
+compression.install(app)  # gzip/Brotli for large JSON responses
+
+@app.after_request
+def add_conditional_headers(response):
+    if request.method != 'GET' or response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return response
+    if not response.get_etag()[0]:
+        response.add_etag()
+    response.headers.setdefault('Cache-Control', 'no-cache')  # Clients may keep the body but must revalidate
+    return response
+
+@app.route('/api/pool_stats', methods=['GET'])
+def get_pool_stats():
+    with db_pool_lock:
+        stats = dict(db_pool_stats)
+    stats['wait_avg_ms'] = stats['wait_total_ms'] / stats['checkouts'] if stats['checkouts'] else 0.0
+    return jsonify(stats), 200
+
+# In-memory cache for the reference tables (venue, machines, venue_assigned_machines)
+# Entries are dropped by invalidate_reference_cache() on writes, and expire after the TTL
+# so edits made directly in the database are picked up eventually
+REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', 300))  # Seconds
+reference_cache = {}  # key -> (version, loaded_at, rows)
+reference_cache_lock = threading.Lock()
+reference_cache_version = 0
+
+def cached_query(key, query):
+    with reference_cache_lock:
+        version = reference_cache_version
+        entry = reference_cache.get(key)
+    if entry and entry[0] == version and time.monotonic() - entry[1] < REFERENCE_CACHE_TTL:
+        return entry[2]
+
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    cursor.close()
+
+    with reference_cache_lock:
+        # Skip storing if a write invalidated the cache while we were querying
+        if version == reference_cache_version:
+            reference_cache[key] = (version, time.monotonic(), rows)
+    return rows
+
+def invalidate_reference_cache():
+    global reference_cache_version
+    with reference_cache_lock:
+        reference_cache_version += 1
+        reference_cache.clear()
+
+# Change feed: write routes publish typed events after they commit, and displays
+# receive them from GET /api/events (Server-Sent Events) instead of polling
+EVENT_HISTORY_SIZE = int(os.getenv('EVENT_HISTORY_SIZE', 200))  # Events kept for clients that reconnect
+EVENT_KEEPALIVE = float(os.getenv('EVENT_KEEPALIVE', 15))  # Seconds between keep-alive comments
+event_log = collections.deque(maxlen=EVENT_HISTORY_SIZE)  # (id, type, data)
+event_condition = threading.Condition()
+# Ids continue from the clock rather than 0, so a client reconnecting after a server
+# restart (or worker recycle) presents an id that is older than this process's history
+event_last_id = int(time.time() * 1000)
+
+def publish_event(event_type, data=None):
+    global event_last_id
+    with event_condition:
+        event_last_id += 1
+        event_log.append((event_last_id, event_type, data))
+        event_condition.notify_all()
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    # EventSource resends the last id it saw when it reconnects
+    last_seen = request.headers.get('Last-Event-ID', type=int)
+    if last_seen is None:
+        last_seen = request.args.get('since', type=int)
+
+    def generate():
+        cursor = event_last_id if last_seen is None else last_seen
+        yield 'retry: 1000\n\n'
+        while True:
+            with event_condition:
+                if cursor <= event_last_id:
+                    event_condition.wait_for(lambda: event_last_id > cursor, timeout=EVENT_KEEPALIVE)
+                # The client missed events (they left the history, or came from another server process);
+                # tell it to reload everything
+                oldest_id = event_log[0][0] if event_log else event_last_id + 1
+                if cursor > event_last_id or cursor + 1 < oldest_id:
+                    pending = [(event_last_id, 'resync', None)]
+                else:
+                    pending = [event for event in event_log if event[0] > cursor]
+            if not pending:
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, event_type, data in pending:
+                yield f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+            cursor = pending[-1][0]
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Don't let a reverse proxy hold events back
+    })
+
+# Outbound calls to the university APIs share one keep-alive session per upstream host,
+# with connect/read timeouts, retries for idempotent requests and a circuit breaker
+UPSTREAM_TIMEOUT = (
+    float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 3)),  # Seconds to establish the connection
+    float(os.getenv('UPSTREAM_READ_TIMEOUT', 10)),  # Seconds to wait between bytes of the response
+)
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 10))  # Keep-alive connections per upstream host
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', 2))
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', 5))  # Consecutive failures before opening
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv('UPSTREAM_BREAKER_COOLDOWN', 30))  # Seconds to fail fast once open
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    pass
+
+def make_upstream_session():
+    retry = Retry(
+        total=UPSTREAM_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=['GET', 'HEAD'],  # Only retry idempotent calls
+        raise_on_status=False,
     )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=UPSTREAM_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+upstreams = {
+    'unis.cspc.edu.ph': {'session': make_upstream_session(), 'failures': 0, 'opened_at': None, 'probing': False},
+    'profile.cspc.edu.ph': {'session': make_upstream_session(), 'failures': 0, 'opened_at': None, 'probing': False},
+}
+upstream_lock = threading.Lock()
+
+# Raise UpstreamUnavailable while the host's breaker is open; after the cooldown a single probe call is let through
+def enter_upstream(host):
+    upstream = upstreams[host]
+    with upstream_lock:
+        if upstream['opened_at'] is not None:
+            if time.monotonic() - upstream['opened_at'] < UPSTREAM_BREAKER_COOLDOWN or upstream['probing']:
+                raise UpstreamUnavailable(f'{host} is unavailable, try again later.')
+            upstream['probing'] = True
+
+# failed is True for connection errors, timeouts and 5xx, False for a success,
+# and None when the call ended without telling us anything (e.g. it was cancelled)
+def record_upstream_result(host, failed):
+    upstream = upstreams[host]
+    with upstream_lock:
+        upstream['probing'] = False
+        if failed:
+            upstream['failures'] += 1
+            if upstream['opened_at'] is not None or upstream['failures'] >= UPSTREAM_BREAKER_THRESHOLD:
+                upstream['opened_at'] = time.monotonic()
+        elif failed is not None:
+            upstream['failures'] = 0
+            upstream['opened_at'] = None
+
+def upstream_request(host, method, url, **kwargs):
+    enter_upstream(host)
+    started = time.perf_counter()
+    try:
+        response = upstreams[host]['session'].request(method, url, timeout=UPSTREAM_TIMEOUT, **kwargs)
+        response.raise_for_status()  # Raise an error for HTTP errors
+    except requests.exceptions.RequestException as e:
+        # Client errors (e.g. an unknown card) don't mean the upstream is down
+        record_upstream_result(host, failed=e.response is None or e.response.status_code >= 500)
+        metrics.observe_upstream(host, 'error', time.perf_counter() - started)
+        raise
+    except BaseException:
+        record_upstream_result(host, failed=None)
+        raise
+
+    record_upstream_result(host, failed=False)
+    metrics.observe_upstream(host, 'ok', time.perf_counter() - started, len(response.content))
+    return response
+
+# CoursePlotting cache: one upstream call per VenueID per TTL
+# - fresh entries are served directly
+# - stale entries are served while a single background refresh runs
+# - concurrent misses for the same body share one upstream call
+# - if the upstream fails, the last good response is served instead
+# - at most COURSE_PLOTTING_CACHE_SIZE venues are kept, least recently used first out
+COURSE_PLOTTING_URL = "https://unis.cspc.edu.ph/unise/APIv1/CoursePlotting"
+COURSE_PLOTTING_TTL = float(os.getenv('COURSE_PLOTTING_TTL', 300))  # Seconds a response is fresh
+COURSE_PLOTTING_STALE_TTL = float(os.getenv('COURSE_PLOTTING_STALE_TTL', 3600))  # Extra seconds it may be served while refreshing
+COURSE_PLOTTING_CACHE_SIZE = int(os.getenv('COURSE_PLOTTING_CACHE_SIZE', 500))  # Venues kept
+course_plotting_cache = collections.OrderedDict()  # VenueID -> {'data': ..., 'fetched_at': ...}
+course_plotting_flights = {}  # VenueID -> in-progress upstream call shared by all waiters
+course_plotting_lock = threading.Lock()
+
+# The VenueID of a /proxy/course-plotting body, or None if it doesn't name one
+def course_plotting_venue_id(payload):
+    venue_id = payload.get('VenueID') if isinstance(payload, dict) else None
+    if not isinstance(venue_id, str) or not venue_id.strip() or len(venue_id) > 64:
+        return None
+    return venue_id
+
+def cache_course_plotting(venue_id, data):
+    with course_plotting_lock:
+        course_plotting_cache[venue_id] = {'data': data, 'fetched_at': time.monotonic()}
+        course_plotting_cache.move_to_end(venue_id)
+        while len(course_plotting_cache) > COURSE_PLOTTING_CACHE_SIZE:
+            course_plotting_cache.popitem(last=False)
+
+def fetch_course_plotting(venue_id):
+    headers = {'Content-Type': 'application/json'}
+    response = upstream_request(
+        'unis.cspc.edu.ph', 'POST', COURSE_PLOTTING_URL, json={'VenueID': venue_id}, headers=headers
+    )
+    return response.json()
+
+def refresh_course_plotting(venue_id, flight):
+    try:
+        data = fetch_course_plotting(venue_id)
+        cache_course_plotting(venue_id, data)
+        flight['data'] = data
+    except (requests.exceptions.RequestException, ValueError) as e:
+        flight['error'] = e
+    finally:
+        with course_plotting_lock:
+            course_plotting_flights.pop(venue_id, None)
+        flight['done'].set()
+
+# Returns (data, cache status) where the status is HIT, STALE or MISS
+def get_course_plotting(venue_id):
+    with course_plotting_lock:
+        entry = course_plotting_cache.get(venue_id)
+        age = time.monotonic() - entry['fetched_at'] if entry else None
+        if entry:
+            course_plotting_cache.move_to_end(venue_id)
+        if entry and age < COURSE_PLOTTING_TTL:
+            return entry['data'], 'HIT'
+        flight = course_plotting_flights.get(venue_id)
+        is_leader = flight is None
+        if is_leader:
+            flight = {'done': threading.Event(), 'data': None, 'error': None}
+            course_plotting_flights[venue_id] = flight
+
+    # Stale but still usable: answer now and refresh in the background
+    if age is not None and age < COURSE_PLOTTING_TTL + COURSE_PLOTTING_STALE_TTL:
+        if is_leader:
+            threading.Thread(target=refresh_course_plotting, args=(venue_id, flight), daemon=True).start()
+        return entry['data'], 'STALE'
+
+    if is_leader:
+        refresh_course_plotting(venue_id, flight)
+    elif not flight['done'].wait(sum(UPSTREAM_TIMEOUT)):
+        flight['error'] = requests.exceptions.Timeout('Timed out waiting for CoursePlotting.')
+
+    if flight['data'] is not None:
+        return flight['data'], 'MISS'
+    if entry:
+        return entry['data'], 'STALE'  # Serve the last good response on error
+    raise flight['error']
 
 # Proxy route for forwarding requests to the API
 @app.route('/proxy/course-plotting', methods=['POST'])
 def proxy_course_plotting():
-    api_url = "https://unis.cspc.edu.ph/unise/APIv1/CoursePlotting"
-    headers = {'Content-Type': 'application/json'}
+    venue_id = course_plotting_venue_id(request.get_json(silent=True))
+    if venue_id is None:
+        return jsonify({'error': 'VenueID is required.'}), 400
     try:
-        # Forward the request body to the actual API
-        response = requests.post(api_url, json=request.json, headers=headers)
-        response.raise_for_status()  # Raise an error for HTTP errors
-        return jsonify(response.json())  # Return the API response to the client
-    except requests.exceptions.RequestException as e:
+        data, cache_status = get_course_plotting(venue_id)
+        response = jsonify(data)  # Return the API response to the client
+        response.headers['X-Cache'] = cache_status
+        return response
+    except UpstreamUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except (requests.exceptions.RequestException, ValueError) as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/proxy/students/<uid>', methods=['GET'])
-def getStud(uid) -> list:
+# Class timeline per venue: each venue's CoursePlotting schedule is compiled into sorted,
+# non-overlapping segments per weekday, so the current and next class are a bisect away.
+# A background thread wakes at the next segment boundary, publishes 'class_changed' for
+# every venue whose class changed, and updates current_faculty once per transition
+# (instead of every display checking the clock and racing to PUT it).
+TIMELINE_MAX_SLEEP = float(os.getenv('TIMELINE_MAX_SLEEP', 60))  # Seconds; new venues and schedule changes are picked up this often
+FACULTY_VENUE_ID = os.getenv('FACULTY_VENUE_ID')  # Venue whose classes set current_faculty; defaults to the only assigned venue
+venue_timelines = {}  # VenueID -> (CoursePlotting rows the timeline was compiled from, weekday -> (boundaries, slots, upcoming))
+venue_classes = {}  # VenueID -> key of the class last announced for it
+faculty_class = None  # Key of the class current_faculty was last committed for
+timeline_lock = threading.Lock()
+timeline_engine = None
+faculty_venue_warning_printed = False
+
+# current_faculty is a single row, so with several venues nothing can update it until
+# FACULTY_VENUE_ID says which one drives it. Only the engine cares: schedules are served regardless
+class TimelineConfigurationError(Exception):
+    pass
+
+def get_faculty_venue_id(venue_ids):
+    if FACULTY_VENUE_ID:
+        if FACULTY_VENUE_ID not in venue_ids:
+            raise TimelineConfigurationError(f"FACULTY_VENUE_ID {FACULTY_VENUE_ID} has no machines assigned to it.")
+        return FACULTY_VENUE_ID
+    if len(venue_ids) > 1:
+        raise TimelineConfigurationError(
+            f"Set FACULTY_VENUE_ID to the venue whose classes set current_faculty "
+            f"({len(venue_ids)} venues have machines assigned)."
+        )
+    return venue_ids[0] if venue_ids else None
+
+def get_assigned_venue_ids():
+    return sorted({row['VenueID'] for row in cached_query('pctovenue', ASSIGNED_VENUES_QUERY)})
+
+def parse_clock(value):
+    parts = [int(part) for part in str(value).split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+def class_key(row):
+    if row is None:
+        return None
+    return tuple(row.get(field) for field in ('DayOfWeek', 'StartTime', 'EndTime', 'EmployeeNo', 'CourseCode', 'Section'))
+
+# weekday (1 = Monday) -> (boundaries, slots, upcoming): slots[i] is the class running from
+# boundaries[i] until boundaries[i + 1] (or None), and upcoming[i] is the index of the next
+# segment with a different class. Where classes overlap, the one that started first wins
+def compile_timeline(rows):
+    classes_by_day = collections.defaultdict(list)
+    for row in rows:
+        try:
+            start, end = parse_clock(row['StartTime']), parse_clock(row['EndTime'])
+            day = int(row['DayOfWeek'])
+        except (KeyError, TypeError, ValueError, IndexError):
+            continue  # Skip malformed rows rather than lose the whole schedule
+        if end > start:
+            classes_by_day[day].append((start, end, row))
+
+    days = {}
+    for day, classes in classes_by_day.items():
+        classes.sort(key=lambda entry: (entry[0], entry[1]))
+        boundaries, slots = [], []
+        for moment in sorted({moment for start, end, _ in classes for moment in (start, end)}):
+            active = next((row for start, end, row in classes if start <= moment < end), None)
+            if slots and class_key(slots[-1]) == class_key(active):
+                continue  # Same class continues; no boundary here
+            boundaries.append(moment)
+            slots.append(active)
+
+        upcoming = [None] * len(slots)
+        following = None
+        for i in range(len(slots) - 1, -1, -1):
+            upcoming[i] = following
+            if slots[i] is not None:
+                following = i
+        days[day] = (boundaries, slots, upcoming)
+    return days
+
+def get_venue_timeline(venue_id):
+    data, _ = get_course_plotting(venue_id)  # Cached; stale data is served while it refreshes
+    rows = (data.get('data') or []) if isinstance(data, dict) else []
+    with timeline_lock:
+        compiled = venue_timelines.get(venue_id)
+        if compiled is None or compiled[0] is not rows:
+            compiled = (rows, compile_timeline(rows))
+            venue_timelines[venue_id] = compiled
+    return compiled[1]
+
+# The venue's current and next class at `now`, and the datetime the current one changes
+def get_class_status(venue_id, now):
+    boundaries, slots, upcoming = get_venue_timeline(venue_id).get(now.isoweekday(), ([], [], []))
+    seconds = now.hour * 3600 + now.minute * 60 + now.second
+    i = bisect.bisect_right(boundaries, seconds) - 1
+    if i < 0:
+        current, next_index = None, 0 if slots else None
+        changes_at = boundaries[0] if boundaries else None
+    else:
+        current, next_index = slots[i], upcoming[i]
+        changes_at = boundaries[i + 1] if i + 1 < len(boundaries) else None
+
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'VenueID': venue_id,
+        'current': current,
+        'next': slots[next_index] if next_index is not None else None,
+        'changes_at': (midnight + timedelta(seconds=changes_at)).isoformat() if changes_at is not None else None,
+    }
+
+# Point current_faculty at the class that just started; a restart mid-class leaves isPresent alone
+def assign_current_faculty(row):
+    full_name = f"{(row.get('FirstName') or '').strip()} {(row.get('LastName') or '').strip()}"
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("""
+        UPDATE current_faculty
+        SET empID = %s, full_name = %s, isPresent = 0, start_time = %s, end_time = %s
+        WHERE id = 1 AND (empID != %s OR start_time != %s OR end_time != %s)
+    """, (row['EmployeeNo'], full_name, row['StartTime'], row['EndTime'],
+          row['EmployeeNo'], row['StartTime'], row['EndTime']))
+    changed = cursor.rowcount > 0
+    connection.commit()
+    cursor.close()
+    if changed:
+        publish_event('faculty_changed', {
+            'empID': row['EmployeeNo'], 'full_name': full_name, 'isPresent': 0,
+            'start_time': row['StartTime'], 'end_time': row['EndTime']
+        })
+
+# Re-evaluate every assigned venue; returns the seconds until the next boundary
+def advance_timelines():
+    global faculty_venue_warning_printed, faculty_class
+    now = datetime.now()
+    wake_in = TIMELINE_MAX_SLEEP
+    with app.app_context():
+        venue_ids = get_assigned_venue_ids()
+        try:
+            faculty_venue_id = get_faculty_venue_id(venue_ids)
+        except TimelineConfigurationError as e:
+            faculty_venue_id = None
+            if not faculty_venue_warning_printed:
+                print(f"WARNING: {e} current_faculty will not follow the schedule until then.")
+                faculty_venue_warning_printed = True
+        for venue_id in venue_ids:
+            try:
+                status = get_class_status(venue_id, now)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Could not load the schedule for venue {venue_id}: {e}")
+                continue
+            if status['changes_at']:
+                wake_in = min(wake_in, (datetime.fromisoformat(status['changes_at']) - now).total_seconds())
+            key = class_key(status['current'])
+            if venue_id not in venue_classes or venue_classes[venue_id] != key:
+                venue_classes[venue_id] = key
+                publish_event('class_changed', status)
+            # Tracked apart from the announcement, so a failed update is retried until it commits
+            if venue_id == faculty_venue_id and faculty_class != key:
+                try:
+                    if status['current'] is not None:
+                        assign_current_faculty(status['current'])
+                    faculty_class = key
+                except mysql.connector.Error as e:
+                    print(f"Could not update current_faculty: {e}")
+                    wake_in = min(wake_in, 5)  # The NFC gate checks taps against it; try again soon
+
+    # The weekday changes at midnight even if no class ends then
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return min(wake_in, (midnight - now).total_seconds())
+
+def run_timeline_engine():
+    while True:
+        try:
+            wake_in = advance_timelines()
+        except mysql.connector.Error as e:
+            print(f"Timeline engine could not reach the database: {e}")
+            wake_in = TIMELINE_MAX_SLEEP
+        except Exception as e:
+            print(f"Timeline engine error: {e}")
+            wake_in = TIMELINE_MAX_SLEEP
+        time.sleep(max(0, wake_in) + 0.01)  # Land just past the boundary
+
+# Started by the first display that asks for its schedule
+def ensure_timeline_engine():
+    global timeline_engine
+    with timeline_lock:
+        if timeline_engine is None:
+            timeline_engine = threading.Thread(target=run_timeline_engine, daemon=True)
+            timeline_engine.start()
+
+@app.route('/api/venues/<venue_id>/current_class', methods=['GET'])
+def get_current_class(venue_id):
+    ensure_timeline_engine()
+    try:
+        return jsonify(get_class_status(venue_id, datetime.now())), 200
+    except UpstreamUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return jsonify({'error': str(e)}), 500
+
+# Card UID -> student profile cache (LRU with TTL)
+# Pictures are kept in a separate LRU bounded by total size, so a burst of new
+# cards can't grow memory without limit; a profile whose picture was evicted is refetched
+# Unknown cards are cached too, for a shorter time
+STUDENT_CACHE_SIZE = int(os.getenv('STUDENT_CACHE_SIZE', 5000))  # Profiles kept
+STUDENT_CACHE_TTL = float(os.getenv('STUDENT_CACHE_TTL', 12 * 3600))  # Seconds
+STUDENT_NEGATIVE_TTL = float(os.getenv('STUDENT_NEGATIVE_TTL', 60))  # Seconds to remember an unknown card
+STUDENT_PICTURE_CACHE_BYTES = int(os.getenv('STUDENT_PICTURE_CACHE_BYTES', 64 * 1024 * 1024))
+student_cache = collections.OrderedDict()  # uid -> (expires_at, body, status, picture_key)
+student_pictures = collections.OrderedDict()  # picture_key -> picture
+student_pictures_bytes = 0
+student_cache_lock = threading.Lock()
+
+def cache_student(uid, body, status):
+    global student_pictures_bytes
+    is_known = status == 200 and body.get('status') == 200
+    picture = body.get('Picture') if is_known else None
+    picture_key = None
+    if isinstance(picture, str) and len(picture) <= STUDENT_PICTURE_CACHE_BYTES:
+        picture_key = hashlib.sha1(picture.encode('utf-8')).hexdigest()
+        body = {key: value for key, value in body.items() if key != 'Picture'}
+    ttl = STUDENT_CACHE_TTL if is_known else STUDENT_NEGATIVE_TTL
+
+    with student_cache_lock:
+        if picture_key and picture_key not in student_pictures:
+            student_pictures[picture_key] = picture
+            student_pictures_bytes += len(picture)
+            while student_pictures_bytes > STUDENT_PICTURE_CACHE_BYTES:
+                _, evicted = student_pictures.popitem(last=False)
+                student_pictures_bytes -= len(evicted)
+        student_cache[uid] = (time.monotonic() + ttl, body, status, picture_key)
+        student_cache.move_to_end(uid)
+        while len(student_cache) > STUDENT_CACHE_SIZE:
+            student_cache.popitem(last=False)
+
+# Returns (body, status) or None if the card has to be looked up
+def get_cached_student(uid):
+    with student_cache_lock:
+        entry = student_cache.get(uid)
+        if entry is None:
+            return None
+        expires_at, body, status, picture_key = entry
+        if expires_at < time.monotonic():
+            del student_cache[uid]
+            return None
+        if picture_key:
+            picture = student_pictures.get(picture_key)
+            if picture is None:
+                return None
+            student_pictures.move_to_end(picture_key)
+        student_cache.move_to_end(uid)
+    if picture_key:
+        body = dict(body, Picture=picture)
+    return body, status
+
+# URL and headers for a StudentInfoByCard lookup
+def student_lookup_request(uid):
     api_url = f"https://profile.cspc.edu.ph/Api/StudentInfoByCard/{uid}"
     headers = {
         'Accept': '*/*',
@@ -43,83 +686,301 @@ def getStud(uid) -> list:
         'Auth-ID': os.getenv('AUTH_ID'),  # Use AUTH_ID from .env
         'Authorization': os.getenv('AUTH')  # Use AUTH from .env
     }
+    return api_url, headers
+
+def fetch_student(uid):
+    api_url, headers = student_lookup_request(uid)
+    try:
+        response = upstream_request('profile.cspc.edu.ph', 'GET', api_url, headers=headers)
+        body, status = response.json(), 200
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code >= 500:
+            raise
+        body, status = {'error': str(e)}, 500  # Unknown card; remembered as a negative entry
+    cache_student(uid, body, status)
+    return body, status
+
+# Look up a list of card UIDs ahead of time so the first tap is a cache hit
+def prewarm_student_cache(uids):
+    for uid in uids:
+        if get_cached_student(uid) is not None:
+            continue
+        try:
+            fetch_student(uid)
+        except UpstreamUnavailable:
+            break
+        except (requests.exceptions.RequestException, ValueError):
+            continue
+
+@app.route('/proxy/students/<uid>', methods=['GET'])
+def getStud(uid) -> list:
+    cached = get_cached_student(uid)
+    if cached is not None:
+        body, status = cached
+        return jsonify(body), status
     try: 
-        # Forward the request body to the actual API
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()  # Raise an error for HTTP errors
-        return jsonify(response.json()), 200  # Return the API response to the client
+        # Forward the request to the actual API
+        body, status = fetch_student(uid)
+        return jsonify(body), status  # Return the API response to the client
+    except UpstreamUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# New endpoint to fetch data from the fingerprints table
+@app.route('/api/students/prewarm', methods=['POST'])
+def prewarm_students():
+    data = request.json or {}
+    uids = data.get('uids')
+
+    if not isinstance(uids, list) or not all(isinstance(uid, str) for uid in uids):
+        return jsonify({'error': 'The "uids" field must be a list of card UIDs.'}), 400
+
+    threading.Thread(target=prewarm_student_cache, args=(uids,), daemon=True).start()
+    return jsonify({'message': f'Pre-warming {len(uids)} cards.'}), 202
+
+# Fingerprint templates: every insert, update and delete gets the next value of a table-wide
+# version counter (triggers from migration 3 in migrations.py), and deleted ids are kept in
+# fingerprint_deletions. The templates are held here as raw bytes, indexed by EmployeeNo;
+# they are loaded once and each request only loads what changed since the cached version,
+# so verifier clients can keep their own copy and ask for the changes with ?since=<version>
+FINGERPRINT_QUERY = """
+    SELECT id, EmployeeNo, fingerprint_template, version, updated_at
+    FROM fingerprints WHERE version > %s
+"""
+fingerprint_cache = {
+    'version': 0,
+    'rows': {},  # id -> row, template as bytes
+    'by_employee': {},  # EmployeeNo -> {id: template bytes}
+    'deleted': {},  # id -> version it was deleted at
+    'payload': None,  # JSON of the full list for 'version', built on first use
+}
+fingerprint_cache_lock = threading.Lock()
+
+def forget_fingerprint_row(fingerprint_id):
+    row = fingerprint_cache['rows'].pop(fingerprint_id, None)
+    if row is None:
+        return
+    templates = fingerprint_cache['by_employee'].get(row['EmployeeNo'], {})
+    templates.pop(fingerprint_id, None)
+    if not templates:
+        fingerprint_cache['by_employee'].pop(row['EmployeeNo'], None)
+
+# Bring the cache up to the database's current version
+def sync_fingerprint_cache():
+    with fingerprint_cache_lock:
+        cached_version = fingerprint_cache['version']
+
+    # All three reads come from the same transaction snapshot, so they agree with each other
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT version FROM fingerprint_sync_version WHERE id = 1")
+    version = cursor.fetchone()['version']
+    if version == cached_version:
+        cursor.close()
+        return
+    cursor.execute(FINGERPRINT_QUERY, (cached_version,))
+    changed = cursor.fetchall()
+    cursor.execute(
+        "SELECT fingerprint_id, version FROM fingerprint_deletions WHERE version > %s", (cached_version,)
+    )
+    deleted = cursor.fetchall()
+    cursor.close()
+
+    with fingerprint_cache_lock:
+        if version <= fingerprint_cache['version']:
+            return  # Another request got here first
+        for row in changed:
+            forget_fingerprint_row(row['id'])  # The row may have moved to another employee
+            if isinstance(row['fingerprint_template'], (bytearray, memoryview)):
+                row['fingerprint_template'] = bytes(row['fingerprint_template'])
+            fingerprint_cache['rows'][row['id']] = row
+            if row['fingerprint_template']:
+                fingerprint_cache['by_employee'].setdefault(row['EmployeeNo'], {})[row['id']] = row['fingerprint_template']
+            fingerprint_cache['deleted'].pop(row['id'], None)
+        for deletion in deleted:
+            row = fingerprint_cache['rows'].get(deletion['fingerprint_id'])
+            if row is None or row['version'] < deletion['version']:
+                forget_fingerprint_row(deletion['fingerprint_id'])
+                fingerprint_cache['deleted'][deletion['fingerprint_id']] = deletion['version']
+        fingerprint_cache['version'] = version
+        fingerprint_cache['payload'] = None
+
+# Templates enrolled for an employee, as bytes (empty if there are none)
+def get_employee_templates(employee_no):
+    sync_fingerprint_cache()
+    with fingerprint_cache_lock:
+        return list(fingerprint_cache['by_employee'].get(employee_no, {}).values())
+
+# Convert BLOB data (bytes) to base64-encoded strings for the JSON response
+def encode_fingerprint_rows(rows):
+    with metrics.timed('fingerprint_base64'):
+        return [
+            dict(row, fingerprint_template=base64.b64encode(row['fingerprint_template']).decode('utf-8'))
+            if isinstance(row['fingerprint_template'], bytes) else row
+            for row in sorted(rows, key=lambda row: row['id'])
+        ]
+
+# Returns the cached rows, plus the version they are current to
+#   GET /api/fingerprints                    every row (a JSON list, as before)
+#   GET /api/fingerprints?employee=<EmployeeNo>  one employee's rows
+#   GET /api/fingerprints?since=<version>    {"version": ..., "fingerprints": [changed rows], "deleted": [ids]}
+# The current version is also sent as the X-Fingerprints-Version header
 @app.route('/api/fingerprints', methods=['GET'])
 def get_fingerprints():
-    try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query
-        query = "SELECT * FROM fingerprints"
-        cursor.execute(query)
-
-        # Fetch all rows
-        rows = cursor.fetchall()
-
-        # Convert BLOB data (bytes) to base64-encoded strings
-        for row in rows:
-            if isinstance(row['fingerprint_template'], bytes):
-                row['fingerprint_template'] = base64.b64encode(row['fingerprint_template']).decode('utf-8')
-
-        # Close the connection
-        cursor.close()
-        connection.close()
+    since = request.args.get('since', type=int)
+    employee = request.args.get('employee')
+    if 'since' in request.args and since is None:
+        return jsonify({'error': 'The "since" parameter must be a version number.'}), 400
 
-        return jsonify(rows), 200  # Return the rows as JSON
+    try:
+        sync_fingerprint_cache()
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
 
+    with fingerprint_cache_lock:
+        version = fingerprint_cache['version']
+        if employee is not None:
+            ids = fingerprint_cache['by_employee'].get(employee, {})
+            rows = [fingerprint_cache['rows'][fingerprint_id] for fingerprint_id in ids]
+        else:
+            rows = list(fingerprint_cache['rows'].values())
+        if since is not None:
+            rows = [row for row in rows if row['version'] > since]
+        deleted = [
+            fingerprint_id for fingerprint_id, deleted_version in fingerprint_cache['deleted'].items()
+            if since is not None and deleted_version > since
+        ]
+        # The unfiltered list is what the verifier downloads; encode and serialize it once per version
+        if since is None and employee is None:
+            if fingerprint_cache['payload'] is None:
+                fingerprint_cache['payload'] = app.json.dumps(encode_fingerprint_rows(rows))
+            payload = fingerprint_cache['payload']
+
+    headers = {'X-Fingerprints-Version': str(version)}
+    if since is None and employee is None:
+        return Response(payload, mimetype='application/json', headers=headers), 200
+    if since is None:
+        return jsonify(encode_fingerprint_rows(rows)), 200, headers
+    return jsonify({
+        'version': version, 'fingerprints': encode_fingerprint_rows(rows), 'deleted': sorted(deleted)
+    }), 200, headers
+
 @app.route('/api/VenueAssignedMachines', methods=['GET'])
 def getVenueandPC():
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query
-        query = "SELECT * FROM venue_assigned_machines"
-        cursor.execute(query)
-
-        # Fetch all rows
-        rows = cursor.fetchall()
-
-        # Close the connection
-        cursor.close()
-        connection.close()
-
+        rows = cached_query('venue_assigned_machines', "SELECT * FROM venue_assigned_machines")
         return jsonify(rows), 200  # Return the rows as JSON
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
     
+# Announcement images are stored on disk, named by the SHA-256 of their bytes;
+# current_announcement.content then only holds that hash
+ANNOUNCEMENT_ASSET_DIR = os.getenv(
+    'ANNOUNCEMENT_ASSET_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'announcement_assets')
+)
+MAX_ANNOUNCEMENT_IMAGE_BYTES = int(os.getenv('MAX_ANNOUNCEMENT_IMAGE_BYTES', 20 * 1024 * 1024))
+IMAGE_HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Detect the image type from the first bytes of the file
+def sniff_image_type(head):
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'GIF87a') or head.startswith(b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def announcement_image_path(image_hash):
+    return os.path.join(ANNOUNCEMENT_ASSET_DIR, image_hash)
+
+# Copy an image stream into the asset store and return its hash
+# Raises ValueError if the data is not a supported image or is too large
+def store_announcement_image(stream):
+    os.makedirs(ANNOUNCEMENT_ASSET_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=ANNOUNCEMENT_ASSET_DIR, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            while True:
+                chunk = stream.read(64 * 1024)
+                if not chunk:
+                    break
+                if size == 0 and sniff_image_type(chunk) is None:
+                    raise ValueError('Only PNG, JPEG, GIF and WebP images are supported.')
+                size += len(chunk)
+                if size > MAX_ANNOUNCEMENT_IMAGE_BYTES:
+                    raise ValueError('Image is too large.')
+                digest.update(chunk)
+                tmp_file.write(chunk)
+        if size == 0:
+            raise ValueError('Image is empty.')
+        renditions.validate(tmp_path)  # The header looked right; make sure the rest decodes too
+        image_hash = digest.hexdigest()
+        os.replace(tmp_path, announcement_image_path(image_hash))  # Same content always lands on the same file
+        # Render the display sizes now, so the first display to ask doesn't wait for it
+        threading.Thread(target=renditions.prerender, args=(ANNOUNCEMENT_ASSET_DIR, image_hash), daemon=True).start()
+        return image_hash
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+# Older rows (and older clients) carry the image itself as base64; move it into the asset store
+def to_announcement_image_hash(content):
+    if IMAGE_HASH_PATTERN.fullmatch(content):
+        if not os.path.isfile(announcement_image_path(content)):
+            raise ValueError(f"No uploaded image has the hash {content}.")
+        return content
+    return store_announcement_image(io.BytesIO(base64.b64decode(content)))
+
+def set_announcement(content, is_image):
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    # Update the announcement with id = 1
+    query = "UPDATE current_announcement SET content = %s, isImage = %s WHERE id = 1"
+    cursor.execute(query, (content, is_image))
+
+    # Commit the changes
+    connection.commit()
+
+    # Close the cursor
+    cursor.close()
+
+def fetch_announcement_rows():
+    # Connect to the database
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
+
+    # Execute the query
+    query = "SELECT * FROM current_announcement"
+    cursor.execute(query)
+
+    # Fetch all rows
+    rows = cursor.fetchall()
+
+    # Close the cursor
+    cursor.close()
+
+    # Convert a legacy base64 image row once, so every later poll only ships the hash
+    for row in rows:
+        if row['isImage'] and not IMAGE_HASH_PATTERN.fullmatch(row['content']):
+            row['content'] = to_announcement_image_hash(row['content'])
+            set_announcement(row['content'], row['isImage'])
+
+    return rows
+
 @app.route('/api/announcement', methods=['GET'])
 def getAnnouncement():
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query
-        query = "SELECT * FROM current_announcement"
-        cursor.execute(query)
-
-        # Fetch all rows
-        rows = cursor.fetchall()
-
-        # Close the connection
-        cursor.close()
-        connection.close()
-
+        rows = fetch_announcement_rows()
         return jsonify(rows), 200  # Return the rows as JSON
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Stored announcement image is invalid: {e}'}), 500
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
     
@@ -134,70 +995,108 @@ def updateAnnouncement():
         if content is None or is_image is None:
             return jsonify({'error': 'Both "content" and "isImage" fields are required.'}), 400
 
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
-        # Update the announcement with id = 1
-        query = "UPDATE current_announcement SET content = %s, isImage = %s WHERE id = 1"
-        cursor.execute(query, (content, is_image))
-
-        # Commit the changes
-        connection.commit()
+        # Image content may be an asset hash or a base64 image
+        if is_image:
+            content = to_announcement_image_hash(content)
 
-        # Close the connection
-        cursor.close()
-        connection.close()
+        set_announcement(content, is_image)
+        publish_event('announcement_updated', {'content': content, 'isImage': is_image})
 
         return jsonify({'message': 'Announcement updated successfully.'}), 200
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Invalid image: {e}'}), 400
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/pctovenue', methods=['GET'])
-def getAssignedVenues():
+# Upload the raw image bytes as the request body and make it the current announcement
+@app.route('/api/announcement/image', methods=['POST'])
+def upload_announcement_image():
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query with JOINs
-        query = """
-        SELECT vam.*, m.machineName, v.VenueDesc
-        FROM venue_assigned_machines vam
-        JOIN machines m ON vam.machineID = m.machineID
-        JOIN venue v ON vam.VenueID = v.VenueID;
-        """
-        cursor.execute(query)
+        image_hash = store_announcement_image(request.stream)
+        set_announcement(image_hash, 1)
+        publish_event('announcement_updated', {'content': image_hash, 'isImage': 1})
 
-        # Fetch all rows
-        rows = cursor.fetchall()
+        return jsonify({'message': 'Announcement updated successfully.', 'hash': image_hash}), 201
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Invalid image: {e}'}), 400
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Close the connection
-        cursor.close()
-        connection.close()
+# Serve a stored image; the URL changes whenever the content does, so it can be cached forever.
+# ?width=&height= (device pixels) picks the smallest display-sized rendition that covers them
+@app.route('/api/announcement/image/<image_hash>', methods=['GET'])
+def get_announcement_image(image_hash):
+    path = announcement_image_path(image_hash)
+    if not IMAGE_HASH_PATTERN.fullmatch(image_hash) or not os.path.isfile(path):
+        abort(404)
+
+    etag = image_hash
+    width = request.args.get('width', type=int)
+    rendition = None
+    if width:
+        box = renditions.choose_box(width, request.args.get('height', type=int))
+        try:
+            rendition = renditions.get_rendition(ANNOUNCEMENT_ASSET_DIR, image_hash, box)
+        except (OSError, ValueError) as e:
+            print(f"Could not render {image_hash}, serving the original: {e}")
+        if rendition:
+            path, mimetype = rendition
+            etag = f'{image_hash}-{box[0]}x{box[1]}'
+    if rendition is None:
+        with open(path, 'rb') as image_file:
+            mimetype = sniff_image_type(image_file.read(16)) or 'application/octet-stream'
+
+    # send_file streams the file and handles Content-Length, ETag and Range requests
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Machine assignments joined with machine and venue names
+ASSIGNED_VENUES_QUERY = """
+SELECT vam.*, m.machineName, v.VenueDesc
+FROM venue_assigned_machines vam
+JOIN machines m ON vam.machineID = m.machineID
+JOIN venue v ON vam.VenueID = v.VenueID;
+"""
+
+# machineID -> assignment row, rebuilt whenever the cached assignment list is reloaded
+# (so writes, which invalidate the reference cache, keep it current)
+machine_venue_index = (None, {})  # (rows the index was built from, index)
+
+def get_machine_venue(machine_id):
+    global machine_venue_index
+    rows = cached_query('pctovenue', ASSIGNED_VENUES_QUERY)
+    indexed_rows, index = machine_venue_index
+    if indexed_rows is not rows:
+        index = {row['machineID']: row for row in rows}
+        machine_venue_index = (rows, index)
+    return index.get(machine_id)
 
+@app.route('/api/pctovenue', methods=['GET'])
+def getAssignedVenues():
+    try:
+        rows = cached_query('pctovenue', ASSIGNED_VENUES_QUERY)
         return jsonify(rows), 200  # Return the rows as JSON
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
 
+# Venue of a single machine, so displays don't download the whole assignment table
+@app.route('/api/pctovenue/<int:machine_id>', methods=['GET'])
+def getMachineVenue(machine_id):
+    try:
+        row = get_machine_venue(machine_id)
+        if row:
+            return jsonify(row), 200
+        else:
+            return jsonify({'error': 'No venue assigned to this machine.'}), 404
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/venues', methods=['GET'])
 def getVenues():
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query
-        query = "SELECT * FROM venue"
-        cursor.execute(query)
-
-        # Fetch all rows
-        rows = cursor.fetchall()
-
-        # Close the connection
-        cursor.close()
-        connection.close()
-
+        rows = cached_query('venue', "SELECT * FROM venue")
         return jsonify(rows), 200  # Return the rows as JSON
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
@@ -217,26 +1116,21 @@ def updateVenue():
         connection = get_db_connection()
         cursor = connection.cursor()
 
-        # Check if the machineID already exists in venue_assigned_machines
-        query_check = "SELECT * FROM venue_assigned_machines WHERE machineID = %s"
-        cursor.execute(query_check, (machine_id,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # Update the venue ID for the given machine ID
-            query_update = "UPDATE venue_assigned_machines SET VenueID = %s WHERE machineID = %s"
-            cursor.execute(query_update, (venue_id, machine_id))
-        else:
-            # Insert new assignment
-            query_insert = "INSERT INTO venue_assigned_machines (machineID, VenueID) VALUES (%s, %s)"
-            cursor.execute(query_insert, (machine_id, venue_id))
+        # Insert the assignment, or move the machine if it already has one
+        # (relies on the unique key on machineID added by migration 2 in migrations.py)
+        query_upsert = """
+            INSERT INTO venue_assigned_machines (machineID, VenueID) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE VenueID = VALUES(VenueID)
+        """
+        cursor.execute(query_upsert, (machine_id, venue_id))
 
         # Commit the changes
         connection.commit()
+        invalidate_reference_cache()
+        publish_event('venue_reassigned', {'machineID': machine_id, 'VenueID': venue_id})
 
-        # Close the connection
+        # Close the cursor
         cursor.close()
-        connection.close()
 
         return jsonify({'message': 'Venue assignment added or updated successfully.'}), 200
     except mysql.connector.Error as e:
@@ -245,21 +1139,7 @@ def updateVenue():
 @app.route('/api/pc', methods=['GET'])
 def getPC():
     try:
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)  # Use dictionary=True to get results as dicts
-
-        # Execute the query
-        query = "SELECT * FROM machines"
-        cursor.execute(query)
-
-        # Fetch all rows
-        rows = cursor.fetchall()
-
-        # Close the connection
-        cursor.close()
-        connection.close()
-
+        rows = cached_query('machines', "SELECT * FROM machines")
         return jsonify(rows), 200  # Return the rows as JSON
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
@@ -279,59 +1159,209 @@ def add_pc():
         query = "INSERT INTO machines (machineName) VALUES (%s)"
         cursor.execute(query, (machine_name,))
         connection.commit()
+        invalidate_reference_cache()
+        publish_event('machines_changed', {'machineID': cursor.lastrowid})
 
         cursor.close()
-        connection.close()
 
         return jsonify({'message': 'PC added successfully.'}), 201
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/student_logs', methods=['POST'])
-def add_student_log():
-    try:
-        data = request.json
-        studID = data.get('studID')
-        full_name = data.get('full_name')
-        instructor = data.get('instructor')
-        yr_section = data.get('yr_section')
-        lab_name = data.get('lab_name')
-
-        # Validate required fields
-        if not all([studID, full_name, instructor, yr_section, lab_name]):
-            return jsonify({'error': 'All fields are required.'}), 400
-
+# Attendance taps are acknowledged right away and written to student_logs in batches
+# by a background thread, either when STUDENT_LOG_BATCH_SIZE taps are waiting or
+# every STUDENT_LOG_FLUSH_INTERVAL seconds. Repeat taps within a minute are dropped
+# in memory. If MySQL is unavailable the batch is spilled to a file in
+# STUDENT_LOG_SPOOL_DIR and replayed once the database is back. If MySQL rejects the
+# batch itself, it is retried one row at a time and the rejected rows are set aside in
+# STUDENT_LOG_SPOOL_DIR/rejected, so one bad tap never holds up the others.
+STUDENT_LOG_BATCH_SIZE = int(os.getenv('STUDENT_LOG_BATCH_SIZE', 50))
+STUDENT_LOG_FLUSH_INTERVAL = float(os.getenv('STUDENT_LOG_FLUSH_INTERVAL', 1))  # Seconds
+STUDENT_LOG_DEDUPE_WINDOW = 60  # Seconds
+STUDENT_LOG_SPOOL_DIR = os.getenv(
+    'STUDENT_LOG_SPOOL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'student_log_spool')
+)
+STUDENT_LOG_REJECTED_DIR = os.path.join(STUDENT_LOG_SPOOL_DIR, 'rejected')
+STUDENT_LOG_FIELD_MAX = 255  # The student_logs columns are varchar(255)
+# Errors that mean the database could not be reached, as opposed to it refusing the rows
+STUDENT_LOG_CONNECTION_ERRORS = (
+    mysql.connector.errors.InterfaceError,
+    mysql.connector.errors.OperationalError,
+    mysql.connector.errors.PoolError,
+)
+STUDENT_LOG_INSERT = """
+    INSERT INTO student_logs (studID, full_name, instructor, yr_section, lab_name, time_arrived)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+student_log_queue = []  # Rows waiting to be inserted
+student_log_recent = {}  # studID -> when its last tap was accepted
+student_log_condition = threading.Condition()
+student_log_flusher = None
+
+# Queue a row unless the student already tapped within the dedupe window
+def enqueue_student_log(row):
+    now = time.monotonic()
+    with student_log_condition:
+        last_tap = student_log_recent.get(row[0])
+        if last_tap is not None and now - last_tap < STUDENT_LOG_DEDUPE_WINDOW:
+            return False
+        student_log_recent[row[0]] = now
+        student_log_queue.append(row)
+        if len(student_log_queue) >= STUDENT_LOG_BATCH_SIZE:
+            student_log_condition.notify()
+    return True
+
+def insert_student_logs(rows):
+    with app.app_context():
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-
-        # Check for existing log for this studID within the last 1 minute
-        query_check = """
-            SELECT * FROM student_logs
-            WHERE studID = %s
-              AND time_arrived >= (NOW() - INTERVAL 1 MINUTE)
-        """
-        cursor.execute(query_check, (studID,))
-        existing_log = cursor.fetchone()
-
-        if existing_log:
-            cursor.close()
-            connection.close()
-            return jsonify({'message': 'Already logged within the last minute.'}), 200
-
-        # Insert new log
-        query_insert = """
-            INSERT INTO student_logs (studID, full_name, instructor, yr_section, lab_name)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query_insert, (studID, full_name, instructor, yr_section, lab_name))
+        cursor = connection.cursor()
+        cursor.executemany(STUDENT_LOG_INSERT, rows)  # Sent as one multi-row INSERT
         connection.commit()
-
         cursor.close()
-        connection.close()
 
-        return jsonify({'message': 'Student log added successfully.'}), 201
+def reject_student_logs(rejected):
+    os.makedirs(STUDENT_LOG_REJECTED_DIR, exist_ok=True)
+    path = os.path.join(STUDENT_LOG_REJECTED_DIR, f'{uuid.uuid4().hex}.jsonl')
+    with open(path, 'w') as rejected_file:
+        for row, error in rejected:
+            rejected_file.write(json.dumps({'row': row, 'error': error}) + '\n')
+    print(f"Set aside {len(rejected)} student log(s) the database rejected: {path}")
+
+# Insert rows and return the ones that could not be written because the database is
+# unreachable. Rows the database refuses are retried one at a time; the ones that still
+# fail are moved to STUDENT_LOG_REJECTED_DIR instead of being retried forever
+def write_student_logs(rows):
+    try:
+        insert_student_logs(rows)
+        return []
+    except STUDENT_LOG_CONNECTION_ERRORS:
+        return rows
     except mysql.connector.Error as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"Database rejected a batch of {len(rows)} student logs ({e}); retrying row by row")
+
+    rejected = []
+    unwritten = []
+    for i, row in enumerate(rows):
+        try:
+            insert_student_logs([row])
+        except STUDENT_LOG_CONNECTION_ERRORS:
+            unwritten = rows[i:]
+            break
+        except mysql.connector.Error as e:
+            rejected.append((row, str(e)))
+    if rejected:
+        reject_student_logs(rejected)
+    return unwritten
+
+def spill_student_logs(rows):
+    os.makedirs(STUDENT_LOG_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(STUDENT_LOG_SPOOL_DIR, f'{uuid.uuid4().hex}.jsonl')
+    with open(path + '.tmp', 'w') as spool_file:
+        for row in rows:
+            spool_file.write(json.dumps(row) + '\n')
+        spool_file.flush()
+        os.fsync(spool_file.fileno())
+    os.replace(path + '.tmp', path)
+
+# Insert spilled batches; each file is claimed by renaming it so two workers never replay the same one
+def replay_spilled_student_logs():
+    if not os.path.isdir(STUDENT_LOG_SPOOL_DIR):
+        return
+    for name in sorted(os.listdir(STUDENT_LOG_SPOOL_DIR)):
+        path = os.path.join(STUDENT_LOG_SPOOL_DIR, name)
+        base, extension = os.path.splitext(path)
+        try:
+            if extension == '.replay' and time.time() - os.path.getmtime(path) > 600:
+                os.rename(path, base + '.jsonl')  # A worker died while replaying this file; put it back
+                continue
+            if extension != '.jsonl':
+                continue
+            os.rename(path, base + '.replay')
+            os.utime(base + '.replay')  # The rename keeps the spill time; start the 600 s clock at the claim
+        except OSError:
+            continue  # Claimed by another worker
+
+        with open(base + '.replay') as spool_file:
+            rows = [json.loads(line) for line in spool_file if line.strip()]
+        unwritten = write_student_logs(rows)
+        if unwritten:
+            # Keep only what is left and stop until the database is back
+            spill_student_logs(unwritten)
+            os.remove(base + '.replay')
+            return
+        os.remove(base + '.replay')
+
+def flush_student_logs():
+    with student_log_condition:
+        batch = student_log_queue[:]
+        student_log_queue.clear()
+    if not batch:
+        return
+    unwritten = write_student_logs(batch)
+    if unwritten:
+        print(f"Could not reach the database; spilling {len(unwritten)} student logs to disk")
+        spill_student_logs(unwritten)
+
+def run_student_log_flusher():
+    while True:
+        with student_log_condition:
+            student_log_condition.wait_for(
+                lambda: len(student_log_queue) >= STUDENT_LOG_BATCH_SIZE, timeout=STUDENT_LOG_FLUSH_INTERVAL
+            )
+            # Forget taps that are outside the dedupe window
+            cutoff = time.monotonic() - STUDENT_LOG_DEDUPE_WINDOW
+            for studID in [key for key, tapped in student_log_recent.items() if tapped < cutoff]:
+                del student_log_recent[studID]
+        try:
+            flush_student_logs()
+            replay_spilled_student_logs()
+        except mysql.connector.Error:
+            pass  # Database still unavailable; spilled logs are retried on the next cycle
+        except Exception as e:
+            print(f"Student log flusher error: {e}")
+
+# Started with the server rather than on the first tap, so logs spilled before a crash or
+# restart are written as soon as the database is reachable. gunicorn.conf.py starts it when
+# a worker boots; the hook below covers the other servers
+def ensure_student_log_flusher():
+    global student_log_flusher
+    with student_log_condition:
+        if student_log_flusher is None:
+            student_log_flusher = threading.Thread(target=run_student_log_flusher, daemon=True)
+            student_log_flusher.start()
+
+@app.before_request
+def start_student_log_flusher():
+    if student_log_flusher is None:
+        ensure_student_log_flusher()
+
+# Don't drop queued taps when the server shuts down
+atexit.register(flush_student_logs)
+
+@app.route('/api/student_logs', methods=['POST'])
+def add_student_log():
+    data = request.json
+    studID = data.get('studID')
+    full_name = data.get('full_name')
+    instructor = data.get('instructor')
+    yr_section = data.get('yr_section')
+    lab_name = data.get('lab_name')
+
+    # Validate required fields
+    if not all([studID, full_name, instructor, yr_section, lab_name]):
+        return jsonify({'error': 'All fields are required.'}), 400
+    # Reject here what the database would reject later, after the tap was acknowledged
+    for field, value in (('studID', studID), ('full_name', full_name), ('instructor', instructor),
+                         ('yr_section', yr_section), ('lab_name', lab_name)):
+        if not isinstance(value, str) or len(value) > STUDENT_LOG_FIELD_MAX:
+            return jsonify({'error': f'"{field}" must be text of at most {STUDENT_LOG_FIELD_MAX} characters.'}), 400
+
+    time_arrived = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Time of the tap, not of the flush
+    if not enqueue_student_log((studID, full_name, instructor, yr_section, lab_name, time_arrived)):
+        return jsonify({'message': 'Already logged within the last minute.'}), 200
+
+    return jsonify({'message': 'Student log queued.'}), 202
     
 @app.route('/api/current_faculty', methods=['PUT'])
 def update_current_faculty():
@@ -358,27 +1388,33 @@ def update_current_faculty():
         """
         cursor.execute(query, (empID, full_name, isPresent, start_time, end_time))
         connection.commit()
+        publish_event('faculty_changed', {
+            'empID': empID, 'full_name': full_name, 'isPresent': isPresent,
+            'start_time': start_time, 'end_time': end_time
+        })
 
         cursor.close()
-        connection.close()
 
         return jsonify({'message': 'Current faculty updated successfully.'}), 200
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
 
+def fetch_current_faculty():
+    connection = get_db_connection()
+    cursor = connection.cursor(dictionary=True)
+
+    # Fetch the row with id = 1
+    query = "SELECT * FROM current_faculty WHERE id = 1"
+    cursor.execute(query)
+    row = cursor.fetchone()
+
+    cursor.close()
+    return row
+
 @app.route('/api/current_faculty', methods=['GET'])
 def get_current_faculty():
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-
-        # Fetch the row with id = 1
-        query = "SELECT * FROM current_faculty WHERE id = 1"
-        cursor.execute(query)
-        row = cursor.fetchone()
-
-        cursor.close()
-        connection.close()
+        row = fetch_current_faculty()
 
         if row:
             return jsonify(row), 200
@@ -396,13 +1432,65 @@ def set_current_faculty_present():
         query = "UPDATE current_faculty SET isPresent = 1 WHERE id = 1"
         cursor.execute(query)
         connection.commit()
+        publish_event('faculty_present')
 
         cursor.close()
-        connection.close()
 
         return jsonify({'message': 'isPresent updated to 1.'}), 200
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
+
+# Called by a display after the fingerprint verifier matched an employee: checks that they
+# are the scheduled instructor and marks them present, in one round trip and one transaction
+@app.route('/api/current_faculty/verify', methods=['POST'])
+def verify_current_faculty():
+    data = request.json or {}
+    employee_no = data.get('EmployeeNo')
+
+    if not employee_no:
+        return jsonify({'error': 'The "EmployeeNo" field is required.'}), 400
+
+    try:
+        if not get_employee_templates(employee_no):
+            return jsonify({'error': 'No fingerprint is enrolled for this employee.'}), 404
+
+        connection = get_db_connection()
+        connection.commit()  # End the snapshot the template sync read from
+        cursor = connection.cursor(dictionary=True)
+
+        # Lock the row so a schedule change can't slip in between the check and the update
+        cursor.execute("SELECT empID, full_name, isPresent FROM current_faculty WHERE id = 1 FOR UPDATE")
+        row = cursor.fetchone()
+        if not row or row['empID'] != employee_no:
+            connection.rollback()
+            cursor.close()
+            return jsonify({'error': 'This employee is not scheduled in this laboratory right now.'}), 403
+
+        if not row['isPresent']:
+            cursor.execute("UPDATE current_faculty SET isPresent = 1 WHERE id = 1")
+        connection.commit()
+        cursor.close()
+        if not row['isPresent']:
+            publish_event('faculty_present')
+
+        return jsonify({'message': 'Instructor verified.', 'empID': row['empID'], 'full_name': row['full_name']}), 200
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+# Everything a display needs at startup in one round trip
+@app.route('/api/display/<int:machine_id>', methods=['GET'])
+def get_display_bootstrap(machine_id):
+    try:
+        announcement_rows = fetch_announcement_rows()
+        return jsonify({
+            'venue': get_machine_venue(machine_id),
+            'current_faculty': fetch_current_faculty(),
+            'announcement': announcement_rows[0] if announcement_rows else None,
+        }), 200
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Stored announcement image is invalid: {e}'}), 500
+    except mysql.connector.Error as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/pc/<int:machine_id>', methods=['DELETE'])
 def delete_pc(machine_id):
     try:
@@ -413,9 +1501,10 @@ def delete_pc(machine_id):
         query = "DELETE FROM machines WHERE machineID = %s"
         cursor.execute(query, (machine_id,))
         connection.commit()
+        invalidate_reference_cache()  # Assignments cascade with the machine
+        publish_event('machines_changed', {'machineID': machine_id})
 
         cursor.close()
-        connection.close()
 
         return jsonify({'message': 'PC deleted successfully.'}), 200
     except mysql.connector.Error as e:
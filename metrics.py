@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_app_context, request
+
+# Request, database and upstream timings for the API, served at GET /metrics in the
+# Prometheus text format. main.py calls install(app) and wraps its database connections
+# with instrument_connection(); counters live in this process only, like the caches.
+#   METRICS_ENABLED=0 turns all of it off
+#   SLOW_REQUEST_MS=500 prints a breakdown of every request slower than 500 ms
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))  # 0 disables the slow-request log
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # Bytes
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Time to handle a request, by route', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('Response body size, by route', SIZE_BUCKETS),
+    'db_connection_acquire_seconds': ('Time to check a connection out of the pool', LATENCY_BUCKETS),
+    'db_query_duration_seconds': ('Time to execute a statement, by SQL fingerprint', LATENCY_BUCKETS),
+    'upstream_request_duration_seconds': ('Time for a call to a campus API, by host', LATENCY_BUCKETS),
+    'upstream_response_size_bytes': ('Campus API response body size, by host', SIZE_BUCKETS),
+    'section_duration_seconds': ('Time spent in a named section of a request handler', LATENCY_BUCKETS),
+}
+histograms = {name: {} for name in HISTOGRAMS}  # name -> labels -> [bucket counts..., sum, count]
+metrics_lock = threading.Lock()
+
+def observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    key = tuple(sorted(labels.items()))
+    with metrics_lock:
+        series = histograms[name].get(key)
+        if series is None:
+            series = histograms[name][key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+# Per-request totals used by the slow-request log
+def add_to_request(field, seconds):
+    if has_app_context() and 'request_metrics' in g:
+        g.request_metrics[field] += seconds
+        g.request_metrics[field.replace('seconds', 'count')] += 1
+
+# Collapse literals so every execution of the same statement shares one series
+def sql_fingerprint(query):
+    query = re.sub(r"'(?:[^'\\]|\\.)*'", '?', query)
+    query = re.sub(r'\b\d+\b', '?', query)
+    query = query.replace('%s', '?')
+    query = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', query)  # IN (?, ?, ?) and VALUES (?, ?)
+    query = ' '.join(query.split()).rstrip(';')
+    return query[:200]
+
+def observe_query(query, seconds):
+    observe('db_query_duration_seconds', {'query': sql_fingerprint(query)}, seconds)
+    add_to_request('db_seconds', seconds)
+
+def observe_connection_acquire(seconds):
+    observe('db_connection_acquire_seconds', {}, seconds)
+    add_to_request('acquire_seconds', seconds)
+
+def observe_upstream(host, outcome, seconds, size=None):
+    observe('upstream_request_duration_seconds', {'host': host, 'outcome': outcome}, seconds)
+    if size is not None:
+        observe('upstream_response_size_bytes', {'host': host}, size)
+    add_to_request('upstream_seconds', seconds)
+
+# Time a block of handler code, e.g. encoding a large result
+@contextmanager
+def timed(section):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if METRICS_ENABLED:
+            observe('section_duration_seconds', {'section': section}, time.perf_counter() - started)
+
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.cursor.execute(query, *args, **kwargs)
+        finally:
+            observe_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.cursor.executemany(query, *args, **kwargs)
+        finally:
+            observe_query(query, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+class InstrumentedConnection:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+def instrument_connection(connection):
+    return InstrumentedConnection(connection) if METRICS_ENABLED else connection
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+def render_metrics():
+    with metrics_lock:
+        snapshot = {name: {key: list(series) for key, series in all_series.items()} for name, all_series in histograms.items()}
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, series in sorted(snapshot[name].items()):
+            for bound, count in zip(buckets, series):
+                lines.append(f'{name}_bucket{format_labels(key + (("le", bound),))} {count}')
+            lines.append(f'{name}_bucket{format_labels(key + (("le", "+Inf"),))} {series[-1]}')
+            lines.append(f'{name}_sum{format_labels(key)} {series[-2]}')
+            lines.append(f'{name}_count{format_labels(key)} {series[-1]}')
+    return '\n'.join(lines) + '\n'
+
+def start_request():
+    g.request_metrics = {
+        'started': time.perf_counter(),
+        'db_seconds': 0.0, 'db_count': 0,
+        'acquire_seconds': 0.0, 'acquire_count': 0,
+        'upstream_seconds': 0.0, 'upstream_count': 0,
+    }
+
+def finish_request(response):
+    totals = g.pop('request_metrics', None)
+    if totals is None:
+        return response
+    seconds = time.perf_counter() - totals['started']
+    route = request.url_rule.rule if request.url_rule else 'unmatched'  # Route pattern, not the raw path
+    observe('http_request_duration_seconds', {
+        'method': request.method, 'route': route, 'status': response.status_code
+    }, seconds)
+    if response.content_length is not None:
+        observe('http_response_size_bytes', {'route': route}, response.content_length)
+
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        print(
+            f"Slow request: {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+            f"in {seconds * 1000:.0f} ms (db: {totals['db_count']} queries, {totals['db_seconds'] * 1000:.0f} ms; "
+            f"pool wait: {totals['acquire_seconds'] * 1000:.0f} ms; "
+            f"upstream: {totals['upstream_count']} calls, {totals['upstream_seconds'] * 1000:.0f} ms)"
+        )
+    return response
+
+def install(app):
+    if not METRICS_ENABLED:
+        return
+    app.before_request(start_request)
+    # Registered before the app's other after_request hooks, so it runs last and sees the final response
+    app.after_request(finish_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,167 @@
+import sys
+import mysql.connector  # Import MySQL connector
+from db_config import DB_CONFIG
+
+# Versioned schema migrations for maclab_db
+# Apply pending migrations with `python migrations.py`, list them with `python migrations.py status`
+# Applied versions are recorded in the schema_migrations table; never edit a migration
+# once it has been applied somewhere, add a new one instead
+#
+# MySQL commits each DDL statement as it runs, so a migration that fails partway leaves
+# its first statements applied and no schema_migrations row. Write statements so that
+# running the migration again finishes the job: IF [NOT] EXISTS where MySQL supports it,
+# otherwise a (guard, statement) pair, where the statement is skipped if the guard query
+# returns a row.
+
+def column_exists(table, column):
+    return ("SELECT 1 FROM information_schema.COLUMNS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND COLUMN_NAME = '{column}'")
+
+def index_exists(table, index):
+    return ("SELECT 1 FROM information_schema.STATISTICS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND INDEX_NAME = '{index}'")
+
+MIGRATIONS = [
+    (1, "Index student_logs on (studID, time_arrived) for the recent-tap lookup", [
+        (index_exists('student_logs', 'idx_student_logs_stud_time'),
+         "ALTER TABLE student_logs ADD INDEX idx_student_logs_stud_time (studID, time_arrived)"),
+    ]),
+    (2, "Make venue_assigned_machines.machineID unique so assignments can be upserted", [
+        # Keep one assignment per machine before adding the unique key
+        "DROP TABLE IF EXISTS venue_assigned_machines_dedup",  # Left by a failed run; rebuilt from the intact table
+        "CREATE TABLE venue_assigned_machines_dedup AS "
+        "SELECT machineID, MAX(VenueID) AS VenueID FROM venue_assigned_machines GROUP BY machineID",
+        "DELETE FROM venue_assigned_machines",
+        "INSERT INTO venue_assigned_machines (machineID, VenueID) "
+        "SELECT machineID, VenueID FROM venue_assigned_machines_dedup",
+        "DROP TABLE venue_assigned_machines_dedup",
+        (index_exists('venue_assigned_machines', 'uniq_venue_assigned_machines_machine'),
+         "ALTER TABLE venue_assigned_machines ADD UNIQUE KEY uniq_venue_assigned_machines_machine (machineID)"),
+    ]),
+    (3, "Version fingerprints rows so verifiers can sync only what changed", [
+        # Triggers left by a failed run must not fire during the UPDATE below; they are created again at the end
+        "DROP TRIGGER IF EXISTS fingerprints_version_insert",
+        "DROP TRIGGER IF EXISTS fingerprints_version_update",
+        "DROP TRIGGER IF EXISTS fingerprints_version_delete",
+        # One counter for the whole table; the row lock it takes makes versions follow commit order
+        """
+        CREATE TABLE IF NOT EXISTS fingerprint_sync_version (
+            id tinyint(4) NOT NULL PRIMARY KEY,
+            version bigint(20) NOT NULL
+        )
+        """,
+        (column_exists('fingerprints', 'version'),
+         "ALTER TABLE fingerprints ADD COLUMN version bigint(20) NOT NULL DEFAULT 0"),
+        (column_exists('fingerprints', 'updated_at'),
+         "ALTER TABLE fingerprints ADD COLUMN updated_at datetime NOT NULL "
+         "DEFAULT current_timestamp() ON UPDATE current_timestamp()"),
+        (index_exists('fingerprints', 'idx_fingerprints_version'),
+         "ALTER TABLE fingerprints ADD INDEX idx_fingerprints_version (version)"),
+        (index_exists('fingerprints', 'idx_fingerprints_employee'),
+         "ALTER TABLE fingerprints ADD INDEX idx_fingerprints_employee (EmployeeNo)"),
+        "UPDATE fingerprints SET version = id",
+        # A failed run may already have handed out higher versions; the counter never goes back
+        "INSERT INTO fingerprint_sync_version (id, version) SELECT 1, COALESCE(MAX(id), 0) FROM fingerprints "
+        "ON DUPLICATE KEY UPDATE version = GREATEST(version, VALUES(version))",
+        # Deleted rows are remembered so clients can drop their copy
+        """
+        CREATE TABLE IF NOT EXISTS fingerprint_deletions (
+            fingerprint_id int(11) NOT NULL PRIMARY KEY,
+            EmployeeNo varchar(100) DEFAULT NULL,
+            version bigint(20) NOT NULL,
+            deleted_at datetime NOT NULL DEFAULT current_timestamp(),
+            INDEX idx_fingerprint_deletions_version (version)
+        )
+        """,
+        """
+        CREATE TRIGGER fingerprints_version_insert BEFORE INSERT ON fingerprints FOR EACH ROW
+        BEGIN
+            UPDATE fingerprint_sync_version SET version = version + 1 WHERE id = 1;
+            SET NEW.version = (SELECT version FROM fingerprint_sync_version WHERE id = 1);
+        END
+        """,
+        """
+        CREATE TRIGGER fingerprints_version_update BEFORE UPDATE ON fingerprints FOR EACH ROW
+        BEGIN
+            UPDATE fingerprint_sync_version SET version = version + 1 WHERE id = 1;
+            SET NEW.version = (SELECT version FROM fingerprint_sync_version WHERE id = 1);
+        END
+        """,
+        """
+        CREATE TRIGGER fingerprints_version_delete AFTER DELETE ON fingerprints FOR EACH ROW
+        BEGIN
+            UPDATE fingerprint_sync_version SET version = version + 1 WHERE id = 1;
+            INSERT INTO fingerprint_deletions (fingerprint_id, EmployeeNo, version)
+            SELECT OLD.id, OLD.EmployeeNo, version FROM fingerprint_sync_version WHERE id = 1
+            ON DUPLICATE KEY UPDATE EmployeeNo = OLD.EmployeeNo, version = VALUES(version), deleted_at = current_timestamp();
+        END
+        """,
+    ]),
+]
+
+def get_applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version int(11) NOT NULL PRIMARY KEY,
+            description varchar(255) NOT NULL,
+            applied_at datetime NOT NULL DEFAULT current_timestamp()
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+# Versions not applied yet, without creating anything; used by main.py before it serves requests
+def get_pending_versions(cursor):
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+    except mysql.connector.errors.ProgrammingError:
+        applied = set()  # No schema_migrations table: nothing has been applied
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+def migrate(connection):
+    cursor = connection.cursor()
+    applied = get_applied_versions(cursor)
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying migration {version}: {description}")
+        for statement in statements:
+            if isinstance(statement, tuple):
+                guard, statement = statement
+                cursor.execute(guard)
+                if cursor.fetchall():
+                    continue  # Applied by an earlier run that failed later on
+            try:
+                cursor.execute(statement)
+            except mysql.connector.Error:
+                print(f"Migration {version} stopped partway; fix the cause and run `python migrations.py` again.")
+                raise
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        connection.commit()
+
+    cursor.close()
+
+def status(connection):
+    cursor = connection.cursor()
+    applied = get_applied_versions(cursor)
+    cursor.close()
+
+    for version, description, _ in MIGRATIONS:
+        state = "applied" if version in applied else "pending"
+        print(f"{version:>4}  {state:<8} {description}")
+
+if __name__ == '__main__':
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == 'status':
+            status(connection)
+        else:
+            migrate(connection)
+            print("Database schema is up to date.")
+    finally:
+        connection.close()
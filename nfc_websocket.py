@@ -1,37 +1,183 @@
 import asyncio
+import os
+import sys
+import threading
+import time
 import websockets
 import ssl
-from py122u import nfc
 
-# Function to get the UID using py122u
-def getUID():
-    uid_parsed = ""
+try:
+    from py122u import nfc
+    from smartcard.System import readers as list_readers
+except ImportError:
+    nfc = None  # Only the stub reader can be used
+
+# One thread reads the NFC reader and one task broadcasts its taps to every connected
+# display, so extra windows or reconnects never add hardware polling.
+# NFC_READER=stub replaces the reader with StubReader: type a card UID (hex) and press
+# Enter to tap it, which makes it possible to test without the hardware.
+NFC_READER = os.getenv('NFC_READER', 'acr122')
+POLL_INTERVAL = 0.25  # Seconds between reads
+REMOVAL_DEBOUNCE = 2  # Empty reads in a row before a card counts as removed
+READER_CHECK_INTERVAL = 5  # Seconds between checks that the reader is still plugged in
+CLIENT_QUEUE_SIZE = 8  # Taps buffered per display; the oldest is dropped when a display falls behind
+STUB_TAP_SECONDS = 1  # How long a typed UID stays on the stub reader
+
+subscribers = set()  # One send queue per connected display
+
+# Stands in for py122u's nfc.Reader
+class StubReader:
+    reader = 'stub'
+
+    def __init__(self):
+        self.card = None
+        self.connection = self
+        threading.Thread(target=self.read_stdin, daemon=True).start()
+
+    def read_stdin(self):
+        print("Stub NFC reader: type a card UID and press Enter to tap it.")
+        for line in sys.stdin:
+            try:
+                card = bytes.fromhex(line.strip())
+            except ValueError:
+                print("Not a hex UID.")
+                continue
+            if card:
+                self.card = card
+                time.sleep(STUB_TAP_SECONDS)
+                self.card = None
+
+    def connect(self):
+        if self.card is None:
+            raise Exception('No card on the reader.')
+
+    def get_uid(self):
+        card = self.card
+        if card is None:
+            raise Exception('No card on the reader.')
+        return list(card)
+
+    def disconnect(self):
+        pass
+
+def open_reader():
+    if NFC_READER == 'stub':
+        return StubReader()
+    if nfc is None:
+        raise RuntimeError('py122u is not installed; set NFC_READER=stub to run without a reader.')
+    return nfc.Reader()
+
+def format_uid(raw_uid):
+    return ''.join(f'{byte:02x}' for byte in raw_uid)  # Ensure two-character hex with leading zeroes
+
+# Read the UID of the card on the reader, or None if there is no card. The reader is opened
+# once; a card connection is opened when a card arrives and kept until it stops answering
+def read_uid(reader, connected):
     try:
-        reader = nfc.Reader()
-        reader.connect()
-        raw_uid = reader.get_uid()
-        for _byte in range(len(raw_uid)):
-            uid_parsed += f'{raw_uid[_byte]:02x}'  # Ensure two-character hex with leading zeroes
-        return uid_parsed
-    except Exception as e:
+        if not connected:
+            reader.connect()
+        return format_uid(reader.get_uid())
+    except Exception:
+        if connected:
+            try:
+                reader.connection.disconnect()
+            except Exception:
+                pass
         return None
 
-# WebSocket handler
-async def nfc_reader(websocket):
+def reader_is_plugged_in(reader):
+    if isinstance(reader, StubReader):
+        return True
+    try:
+        return str(reader.reader) in [str(name) for name in list_readers()]
+    except Exception:
+        return False
+
+# Runs in its own thread so PC/SC calls never block the event loop; reports a card once
+# when it arrives and once when it has been gone for REMOVAL_DEBOUNCE reads
+def run_reader(loop, events):
+    def emit(kind, uid):
+        loop.call_soon_threadsafe(events.put_nowait, (kind, uid))
+
+    reader = None
+    present_uid = None
+    misses = 0
+    last_check = time.monotonic()
+    while True:
+        started = time.monotonic()
+        if reader is None:
+            try:
+                reader = open_reader()
+                print("NFC reader opened.")
+            except RuntimeError:
+                raise
+            except Exception:
+                time.sleep(READER_CHECK_INTERVAL)  # No reader yet
+                continue
+
+        uid = read_uid(reader, connected=present_uid is not None and misses == 0)
+        if uid:
+            misses = 0
+            if uid != present_uid:
+                if present_uid:
+                    emit('removed', present_uid)
+                present_uid = uid
+                emit('present', uid)
+        elif present_uid:
+            misses += 1
+            if misses >= REMOVAL_DEBOUNCE:
+                emit('removed', present_uid)
+                present_uid = None
+                misses = 0
+        elif started - last_check >= READER_CHECK_INTERVAL:
+            # Nothing on the reader; make sure that is not because it was unplugged
+            last_check = started
+            if not reader_is_plugged_in(reader):
+                print("NFC reader disconnected.")
+                reader = None
+
+        time.sleep(max(0, POLL_INTERVAL - (time.monotonic() - started)))
+
+# The single consumer of the reader's events: hands each tap to every display's queue
+async def broadcast_taps(events):
+    while True:
+        kind, uid = await events.get()
+        if kind != 'present':
+            continue
+        print(f"Card UID: {uid} -> {len(subscribers)} display(s)")
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()  # This display is behind; drop its oldest tap rather than wait for it
+            queue.put_nowait(uid)
+
+async def send_taps(websocket, queue):
     try:
         while True:
-            uid = getUID()  # Get the UID from the NFC reader
-            if uid:
-                print(f"Card UID: {uid}")
-                await websocket.send(uid)  # Send UID to the WebSocket client
-            else:
-                pass
-            await asyncio.sleep(0.25)  # Poll every second
-    except Exception as e:
+            uid = await queue.get()
+            await websocket.send(uid)  # Send UID to the WebSocket client
+    except websockets.ConnectionClosed:
         pass
 
+# WebSocket handler
+async def nfc_reader(websocket):
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    subscribers.add(queue)
+    sender = asyncio.create_task(send_taps(websocket, queue))
+    closed = asyncio.create_task(websocket.wait_closed())
+    try:
+        # Sending stops with the connection; waiting here notices a close even when no taps arrive
+        await asyncio.wait([sender, closed], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscribers.discard(queue)
+        sender.cancel()
+        closed.cancel()
+
 # Main function to start the WebSocket server
 async def main():
+    card_events = asyncio.Queue()
+    threading.Thread(target=run_reader, args=(asyncio.get_running_loop(), card_events), daemon=True).start()
+    broadcaster = asyncio.create_task(broadcast_taps(card_events))  # Keep a reference so it isn't garbage collected
+
     # Load SSL certificate and private key
     ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     ssl_context.load_cert_chain(certfile="certificate.pem", keyfile="privatekey.pem")
@@ -42,4 +188,4 @@ async def main():
         await asyncio.Future()  # Run forever
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import aiohttp
+from aiohttp import web
+import main  # Shares settings, caches and circuit breakers with the Flask app
+import metrics
+import compression
+
+# Async server for the routes that only forward to the campus APIs
+#   python proxy_server.py
+# A slow upstream call here is just a suspended coroutine, so hundreds of in-flight
+# calls share one process instead of each holding a Flask worker thread.
+# Each upstream host gets its own keep-alive session and a semaphore that bounds how
+# many calls are in flight; when a display disconnects its handler is cancelled,
+# which cancels its upstream call too.
+
+PROXY_HOST = os.getenv('PROXY_HOST', '0.0.0.0')
+PROXY_PORT = int(os.getenv('PROXY_PORT', 5001))
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', 100))  # In-flight calls per upstream host
+
+sessions = {}  # host -> aiohttp.ClientSession
+semaphores = {}  # host -> asyncio.Semaphore
+course_plotting_flights = {}  # VenueID -> task fetching it
+prewarm_tasks = set()  # Running pre-warms; asyncio only keeps weak references to tasks
+
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, main.UpstreamUnavailable, ValueError)
+
+async def start_sessions(app):
+    timeout = aiohttp.ClientTimeout(sock_connect=main.UPSTREAM_TIMEOUT[0], sock_read=main.UPSTREAM_TIMEOUT[1])
+    for host in main.upstreams:
+        connector = aiohttp.TCPConnector(limit=main.UPSTREAM_POOL_SIZE, keepalive_timeout=60)
+        sessions[host] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        semaphores[host] = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+
+async def close_sessions(app):
+    for session in sessions.values():
+        await session.close()
+
+async def upstream_call(host, method, url, **kwargs):
+    # Only idempotent calls are retried, as in main.upstream_request
+    attempts = main.UPSTREAM_RETRIES + 1 if method == 'GET' else 1
+    for attempt in range(attempts):
+        main.enter_upstream(host)
+        started = time.perf_counter()
+        try:
+            async with semaphores[host]:
+                async with sessions[host].request(method, url, **kwargs) as response:
+                    response.raise_for_status()  # Raise an error for HTTP errors
+                    body = await response.read()
+            data = json.loads(body)
+        except aiohttp.ClientResponseError as e:
+            main.record_upstream_result(host, failed=e.status >= 500)
+            metrics.observe_upstream(host, 'error', time.perf_counter() - started)
+            if e.status not in (502, 503, 504) or attempt == attempts - 1:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            main.record_upstream_result(host, failed=True)
+            metrics.observe_upstream(host, 'error', time.perf_counter() - started)
+            if attempt == attempts - 1:
+                raise
+        except BaseException:
+            main.record_upstream_result(host, failed=None)
+            raise
+        else:
+            main.record_upstream_result(host, failed=False)
+            metrics.observe_upstream(host, 'ok', time.perf_counter() - started, len(body))
+            return data
+        await asyncio.sleep(0.5 * 2 ** attempt)  # Back off before retrying
+
+async def refresh_course_plotting(venue_id):
+    data = await upstream_call(
+        'unis.cspc.edu.ph', 'POST', main.COURSE_PLOTTING_URL,
+        json={'VenueID': venue_id}, headers={'Content-Type': 'application/json'}
+    )
+    main.cache_course_plotting(venue_id, data)
+    return data
+
+def start_course_plotting_refresh(venue_id):
+    task = course_plotting_flights.get(venue_id)
+    if task is None:
+        task = asyncio.ensure_future(refresh_course_plotting(venue_id))
+        course_plotting_flights[venue_id] = task
+
+        def finished(task):
+            course_plotting_flights.pop(venue_id, None)
+            if not task.cancelled():
+                task.exception()  # Background refresh errors are expected; the stale entry stays
+
+        task.add_done_callback(finished)
+    return task
+
+# Same cache policy as main.get_course_plotting: HIT, STALE while refreshing, or a shared MISS
+async def get_course_plotting(venue_id):
+    with main.course_plotting_lock:
+        entry = main.course_plotting_cache.get(venue_id)
+        if entry:
+            main.course_plotting_cache.move_to_end(venue_id)
+    age = time.monotonic() - entry['fetched_at'] if entry else None
+    if entry and age < main.COURSE_PLOTTING_TTL:
+        return entry['data'], 'HIT'
+
+    task = start_course_plotting_refresh(venue_id)
+    if age is not None and age < main.COURSE_PLOTTING_TTL + main.COURSE_PLOTTING_STALE_TTL:
+        return entry['data'], 'STALE'
+
+    try:
+        # Shielded: a display that disconnects stops waiting, but the shared call still fills the cache
+        return await asyncio.shield(task), 'MISS'
+    except UPSTREAM_ERRORS:
+        if entry:
+            return entry['data'], 'STALE'  # Serve the last good response on error
+        raise
+
+# Compact JSON, compressed as in the Flask app (same threshold and compressed-body cache)
+def json_response(request, data, status=200, headers=None):
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    encoding = compression.choose_encoding(request.headers.get('Accept-Encoding'))
+    if status == 200 and encoding and len(body) >= compression.COMPRESS_MIN_BYTES:
+        body = compression.compress(body, encoding, hashlib.sha1(body).hexdigest())
+        headers['Content-Encoding'] = encoding
+    return web.Response(body=body, status=status, content_type='application/json', headers=headers)
+
+async def proxy_course_plotting(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    venue_id = main.course_plotting_venue_id(payload)
+    if venue_id is None:
+        return json_response(request, {'error': 'VenueID is required.'}, status=400)
+    try:
+        data, cache_status = await get_course_plotting(venue_id)
+        return json_response(request, data, headers={'X-Cache': cache_status})
+    except main.UpstreamUnavailable as e:
+        return json_response(request, {'error': str(e)}, status=503)
+    except UPSTREAM_ERRORS as e:
+        return json_response(request, {'error': str(e)}, status=500)
+
+# Look a card up and cache the answer, as main.fetch_student does; returns (body, status)
+async def fetch_student(uid):
+    api_url, headers = main.student_lookup_request(uid)
+    try:
+        body, status = await upstream_call('profile.cspc.edu.ph', 'GET', api_url, headers=headers), 200
+    except aiohttp.ClientResponseError as e:
+        if e.status >= 500:
+            raise
+        body, status = {'error': str(e)}, 500  # Unknown card; remembered as a negative entry
+    main.cache_student(uid, body, status)
+    return body, status
+
+async def get_student(request):
+    uid = request.match_info['uid']
+    cached = main.get_cached_student(uid)
+    if cached is not None:
+        body, status = cached
+        return json_response(request, body, status=status)
+
+    try:
+        body, status = await fetch_student(uid)
+    except main.UpstreamUnavailable as e:
+        return json_response(request, {'error': str(e)}, status=503)
+    except UPSTREAM_ERRORS as e:
+        return json_response(request, {'error': str(e)}, status=500)
+    return json_response(request, body, status=status)
+
+async def prewarm_student_cache(uids):
+    for uid in uids:
+        if main.get_cached_student(uid) is not None:
+            continue
+        try:
+            await fetch_student(uid)
+        except main.UpstreamUnavailable:
+            break
+        except UPSTREAM_ERRORS:
+            continue
+
+# Same as the Flask route, but warms this process's cache, which is the one card taps read
+async def prewarm_students(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    uids = data.get('uids') if isinstance(data, dict) else None
+
+    if not isinstance(uids, list) or not all(isinstance(uid, str) for uid in uids):
+        return json_response(request, {'error': 'The "uids" field must be a list of card UIDs.'}, status=400)
+
+    task = asyncio.ensure_future(prewarm_student_cache(uids))
+    prewarm_tasks.add(task)
+    task.add_done_callback(prewarm_tasks.discard)
+    return json_response(request, {'message': f'Pre-warming {len(uids)} cards.'}, status=202)
+
+# Upstream timings for this process, in the same format as the Flask app's /metrics
+async def get_metrics(request):
+    return web.Response(text=metrics.render_metrics(), content_type='text/plain')
+
+# Displays call this server from another origin, like the Flask app (which uses flask_cors)
+@web.middleware
+async def cors(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.on_startup.append(start_sessions)
+    app.on_cleanup.append(close_sessions)
+    app.router.add_route('POST', '/proxy/course-plotting', proxy_course_plotting)
+    app.router.add_route('OPTIONS', '/proxy/course-plotting', proxy_course_plotting)
+    app.router.add_route('GET', '/proxy/students/{uid}', get_student)
+    app.router.add_route('POST', '/api/students/prewarm', prewarm_students)
+    app.router.add_route('OPTIONS', '/api/students/prewarm', prewarm_students)
+    app.router.add_route('GET', '/metrics', get_metrics)
+    return app
+
+if __name__ == '__main__':
+    # handler_cancellation cancels a handler (and its upstream call) when the client goes away
+    web.run_app(create_app(), host=PROXY_HOST, port=PROXY_PORT, handler_cancellation=True)
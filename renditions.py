@@ -0,0 +1,110 @@
+import os
+import tempfile
+import threading
+
+try:
+    from PIL import Image, ImageOps  # Optional: pip install pillow
+except ImportError:
+    Image = None
+
+# Display-sized renditions of announcement images. An uploaded photo is decoded once on
+# the server, downscaled to fit each configured box and re-encoded, so displays download
+# and decode an image about the size of their screen instead of the original.
+# Renditions are files next to the original, named by its content hash, so they are
+# rendered once per image. main.py validates uploads with validate() and serves
+# renditions from get_rendition(); without Pillow the original is served as before.
+#   ANNOUNCEMENT_RENDITIONS=1280x960,1920x1080,3840x2160   boxes (width x height) to render
+
+ANNOUNCEMENT_RENDITIONS = sorted(
+    tuple(int(side) for side in box.lower().split('x'))
+    for box in os.getenv('ANNOUNCEMENT_RENDITIONS', '1280x960,1920x1080,3840x2160').split(',')
+    if box.strip()
+)
+RENDITION_FORMAT = os.getenv('ANNOUNCEMENT_RENDITION_FORMAT', 'WEBP').upper()  # WEBP or JPEG
+RENDITION_QUALITY = int(os.getenv('ANNOUNCEMENT_RENDITION_QUALITY', 80))
+MAX_IMAGE_PIXELS = int(os.getenv('ANNOUNCEMENT_MAX_PIXELS', 50_000_000))  # Larger images are rejected as decompression bombs
+RENDITION_MIMETYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS  # Also guards the decoding in render(); validate() enforces the limit itself
+
+rendition_locks = {}  # Rendition path -> lock, so concurrent requests render it once
+rendition_locks_lock = threading.Lock()
+
+# Smallest box that covers width x height, or the largest one if none does
+def choose_box(width, height=None):
+    for box in ANNOUNCEMENT_RENDITIONS:
+        if box[0] >= width and (height is None or box[1] >= height):
+            return box
+    return ANNOUNCEMENT_RENDITIONS[-1] if ANNOUNCEMENT_RENDITIONS else None
+
+def rendition_path(asset_dir, image_hash, box):
+    extension = 'jpg' if RENDITION_FORMAT == 'JPEG' else RENDITION_FORMAT.lower()
+    return os.path.join(asset_dir, 'renditions', f'{image_hash}-{box[0]}x{box[1]}.{extension}')
+
+# Raises ValueError if Pillow can't decode the file or it has too many pixels
+def validate(path):
+    if Image is None:
+        return
+    try:
+        with Image.open(path) as image:
+            # Pillow itself only refuses images over twice MAX_IMAGE_PIXELS (it warns below that)
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                raise ValueError(
+                    f'Image is too large: {image.width}x{image.height} is over {MAX_IMAGE_PIXELS} pixels.'
+                )
+            image.verify()  # Checks the file's structure without decoding every pixel
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Image could not be decoded: {e}')
+
+def render(source_path, path, box):
+    with Image.open(source_path) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', box)  # Let libjpeg decode at a reduced scale
+        image = ImageOps.exif_transpose(image)  # Phone photos are stored sideways with a rotation tag
+        image.thumbnail(box, Image.Resampling.LANCZOS)  # Keeps the aspect ratio; never enlarges
+        if RENDITION_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if RENDITION_FORMAT == 'WEBP' and 'A' in image.getbands() else 'RGB')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                if RENDITION_FORMAT == 'WEBP':
+                    image.save(tmp_file, 'WEBP', quality=RENDITION_QUALITY, method=4)
+                else:
+                    image.save(tmp_file, 'JPEG', quality=RENDITION_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+# (path, mimetype) of the rendition of an image that fits in `box`, rendering it on first
+# use; None when the original should be served instead (no Pillow, or an animated GIF/WebP)
+def get_rendition(asset_dir, image_hash, box):
+    if Image is None or box is None:
+        return None
+    path = rendition_path(asset_dir, image_hash, box)
+    if not os.path.isfile(path):
+        with rendition_locks_lock:
+            lock = rendition_locks.setdefault(path, threading.Lock())
+        with lock:
+            if not os.path.isfile(path):
+                source_path = os.path.join(asset_dir, image_hash)
+                with Image.open(source_path) as image:
+                    if getattr(image, 'is_animated', False):
+                        return None  # Re-encoding would keep only the first frame
+                render(source_path, path, box)
+        with rendition_locks_lock:
+            rendition_locks.pop(path, None)
+    return path, RENDITION_MIMETYPES[RENDITION_FORMAT]
+
+# Render every configured size ahead of the first display asking for one
+def prerender(asset_dir, image_hash):
+    for box in ANNOUNCEMENT_RENDITIONS:
+        try:
+            if get_rendition(asset_dir, image_hash, box) is None:
+                return
+        except (OSError, ValueError) as e:
+            print(f"Could not render {image_hash} at {box[0]}x{box[1]}: {e}")
+            return
@@ -4,6 +4,7 @@ import LaboratoryName from './components/LaboratoryName';
 import Plotting from './components/Plotting';
 import axios from 'axios';
 import { MACHINE_ID } from './utils/consts';
+import { subscribeToChanges } from './utils/changeFeed';
 import { base64Image } from './testimg';
 import NotificationPopup from './components/NotificationPopup'; // Import the NotificationPopup component
 import NFCReaderPopup from './components/NFCReaderPopup';
@@ -17,6 +18,8 @@ const App = () => {
   const machineID = MACHINE_ID; // Replace with the actual machineID
   const [notification, setNotification] = useState(null);
   const [currentInstructor, setCurrentInstructor] = useState(null);
+  const [venueID, setVenueID] = useState(null); // Sent to the command hub so venue-wide commands reach this display
+  const venueIDRef = useRef(null);
   // Fetch announcement from the API
   const fetchAnnouncement = async () => {
     try {
@@ -33,6 +36,13 @@ const App = () => {
     }
   };
 
+  // Tell the command hub which machine and venue this display is, so targeted commands reach it
+  const registerWithHub = () => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'register', machineID, venue: venueIDRef.current, topics: ['displays'] }));
+    }
+  };
+
   // WebSocket connection logic
   useEffect(() => {
 
@@ -48,6 +58,7 @@ const App = () => {
         console.log('WebSocket connection established.');
         clearInterval(reconnectIntervalRef.current); // Clear reconnection interval
         reconnectIntervalRef.current = null;
+        registerWithHub();
       };
 
       wsRef.current.onmessage = (event) => {
@@ -99,15 +110,27 @@ const App = () => {
     };
   }, []);
 
-  // Poll announcements periodically
+  // Re-register once ClassScheduleCard has looked up the venue
+  useEffect(() => {
+    venueIDRef.current = venueID;
+    registerWithHub();
+  }, [venueID]);
+
+  // Refetch the announcement whenever the backend reports a change
   useEffect(() => {
     fetchAnnouncement(); // Fetch immediately on mount
 
+    const unsubscribe = subscribeToChanges(['announcement_updated'], () => {
+      fetchAnnouncement();
+    });
+
+    // Slow safety-net poll in case the change feed is unavailable
     pollingIntervalRef.current = setInterval(() => {
-      fetchAnnouncement(); // Fetch periodically
-    }, 1000); // Poll every 30 seconds
+      fetchAnnouncement();
+    }, 60000);
 
     return () => {
+      unsubscribe();
       if (pollingIntervalRef.current) {
         clearInterval(pollingIntervalRef.current); // Cleanup polling interval
       }
@@ -120,16 +143,12 @@ const launchFingerprintApp = () => {
   window.ipcRenderer.once('dotnet-result', async (event, result) => {
     if (result.success) {
       try {
-        // Get current faculty from backend
-        const facultyRes = await axios.get('http://ws-server.local:5000/api/current_faculty');
-        const currentEmpID = facultyRes.data?.empID;
-
-        if (result.employeeNumber === currentEmpID) {
-          // If match, update isPresent to 1
-          await axios.put('http://ws-server.local:5000/api/current_faculty/present');
-       
+        // Checks that this is the scheduled instructor and marks them present
+        await axios.post('http://ws-server.local:5000/api/current_faculty/verify', {
+          EmployeeNo: result.employeeNumber,
+        });
 
-        // Proceed to unlock the door regardless of match
+        // Proceed to unlock the door
         setNotification({ message: `Fingerprint verified. Door unlocking...`, isSuccess: 'waiting' });
         try {
           await axios.post('http://maclab.local:5000/unlock');
@@ -137,11 +156,12 @@ const launchFingerprintApp = () => {
         } catch (unlockError) {
           setNotification({ message: `Door unlock failed. Please report to the technicians`, isSuccess: 'no' });
         }
-         } else { 
-          setNotification({ message: `Access denied: You are not scheduled to use this laboratory right now.`, isSuccess: 'no' });
-         }
       } catch (err) {
-        setNotification({ message: `Error verifying instructor.`, isSuccess: 'no' });
+        if (err.response?.status === 403 || err.response?.status === 404) {
+          setNotification({ message: `Access denied: You are not scheduled to use this laboratory right now.`, isSuccess: 'no' });
+        } else {
+          setNotification({ message: `Error verifying instructor.`, isSuccess: 'no' });
+        }
       }
     } else {
       setNotification({ message: 'Fingerprint verification failed!', isSuccess: 'no' });
@@ -171,14 +191,14 @@ const launchFingerprintApp = () => {
       <div className="relative flex justify-center items-center min-h-screen">
         {(() => {
           if (displayMode === 'schedule') {
-            return <ClassScheduleCard setLaboratoryName={setLaboratoryName} setCurrentInstructor={setCurrentInstructor} />; {/* Pass setter to ClassScheduleCard */ }
+            return <ClassScheduleCard setLaboratoryName={setLaboratoryName} setCurrentInstructor={setCurrentInstructor} onVenueChange={setVenueID} />; {/* Pass setter to ClassScheduleCard */ }
           } else if (displayMode === 'announcement') {
             return (
               <div className="w-full max-w-7xl bg-white dark:bg-gray-800 shadow-lg rounded-md border border-gray-200 dark:border-gray-700 p-6">
                 <h1 className="text-4xl font-bold p-5 text-gray-800 dark:text-gray-200 mb-4 text-center">Announcement</h1>
                 {announcement?.isImage ? (
                   <img
-                    src={`data:image/jpeg;base64,${announcement.content}`}
+                    src={`http://ws-server.local:5000/api/announcement/image/${announcement.content}?width=${Math.round(1000 * window.devicePixelRatio)}&height=${Math.round(800 * window.devicePixelRatio)}`} // Display-sized rendition of the image
                     alt="Announcement"
                     className="w-full h-auto rounded-md"
                     style={{
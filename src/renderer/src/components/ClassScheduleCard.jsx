@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
-import dummyData from './DummyData'; // Import the dummy data
 import { MACHINE_ID } from '../utils/consts';
 import axios from 'axios';
+import { subscribeToChanges } from '../utils/changeFeed';
 
 // Helper function to convert 24-hour time to 12-hour format
 const formatTimeTo12Hour = (time) => {
@@ -12,87 +12,112 @@ const formatTimeTo12Hour = (time) => {
   return `${formattedHour}:${minutes} ${ampm}`;
 };
 
-const ClassScheduleCard = ({ setLaboratoryName, setCurrentInstructor }) => {
+const ClassScheduleCard = ({ setLaboratoryName, setCurrentInstructor, onVenueChange }) => {
   const [currentSchedule, setCurrentSchedule] = useState(null);
   const [currentDate, setCurrentDate] = useState(new Date());
-  const [scheduleData, setScheduleData] = useState([]);
   const [venueID, setVenueID] = useState(null); // State for VenueID
-  const [useDummyData, setUseDummyData] = useState(false); // Toggle for test mode
 
 
+  // Apply the venue assigned to this machine (or null if it has none)
+  const applyMachineVenue = (machineVenue) => {
+    if (machineVenue) {
+      console.log('Found venue for machine:', machineVenue); // Log the found venue
+      setVenueID(machineVenue.VenueID); // Set the VenueID for the machine
+      setLaboratoryName(machineVenue.VenueDesc); // Pass VenueDesc to App.jsx
+      onVenueChange?.(machineVenue.VenueID); // App.jsx registers the venue with the command hub
+    } else {
+      console.warn('No venue assigned to this machine.');
+      setVenueID(null); // Reset VenueID if not found
+      setLaboratoryName('Unknown Laboratory'); // Default value
+      onVenueChange?.(null);
+    }
+  };
+
   // Function to fetch VenueID and VenueDesc for the MACHINE_ID
   const fetchVenueID = async () => {
     try {
-      const response = await fetch('http://ws-server.local:5000/api/pctovenue');
+      const response = await fetch(`http://ws-server.local:5000/api/pctovenue/${MACHINE_ID}`);
+      if (response.status === 404) {
+        applyMachineVenue(null);
+        return;
+      }
       if (!response.ok) {
         throw new Error('Failed to fetch venue data');
       }
-      const data = await response.json();
-      console.log('Fetched venue data:', data); // Log the fetched data
-      const machineVenue = data.find((item) => parseInt(item.machineID, 10) === parseInt(MACHINE_ID, 10));
-      if (machineVenue) {
-        console.log('Found venue for machine:', machineVenue); // Log the found venue
-        setVenueID(machineVenue.VenueID); // Set the VenueID for the machine
-        setLaboratoryName(machineVenue.VenueDesc); // Pass VenueDesc to App.jsx
-      } else {
-        console.warn('No venue assigned to this machine.');
-        setVenueID(null); // Reset VenueID if not found
-        setLaboratoryName('Unknown Laboratory'); // Default value
-      }
+      applyMachineVenue(await response.json());
     } catch (error) {
       console.error('Error fetching venue data:', error);
       setLaboratoryName('Error Fetching Laboratory'); // Error fallback
     }
   };
 
-  // Function to fetch schedule data from the API
-  const fetchScheduleData = async () => {
-    if (useDummyData) {
-      console.log('Using dummy data');
-      setScheduleData(dummyData); // Use dummy data in test mode
-      return;
+  // Fetch the venue and current faculty in one round trip on startup
+  const fetchDisplayBootstrap = async () => {
+    try {
+      const res = await axios.get(`http://ws-server.local:5000/api/display/${MACHINE_ID}`);
+      applyMachineVenue(res.data.venue);
+    } catch (error) {
+      console.error('Error fetching display data:', error);
+      setLaboratoryName('Error Fetching Laboratory'); // Error fallback
     }
+  };
+
+  // Show the class the backend says is running in this venue
+  const applyClassStatus = (status) => {
+    setCurrentSchedule(status.current || null);
+    setCurrentInstructor(status.current ? status.current.EmployeeNo : null);
+  };
 
+  // Function to fetch the venue's current class from the backend's timeline
+  const fetchCurrentClass = async () => {
     if (!venueID) {
       console.warn('VenueID is not available. Skipping schedule fetch.');
       return;
     }
 
     try {
-      const response = await fetch('http://ws-server.local:5000/proxy/course-plotting', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          VenueID: venueID, // Use the dynamically fetched VenueID
-        }),
-      });
-
-      if (!response.ok) {
-        throw new Error('Failed to fetch schedule data');
-      }
-
-      const data = await response.json();
-      setScheduleData(data.data); // Update state with fetched data
+      const res = await axios.get(`http://ws-server.local:5000/api/venues/${encodeURIComponent(venueID)}/current_class`);
+      applyClassStatus(res.data);
     } catch (error) {
-      console.error('Error fetching schedule data:', error);
+      console.error('Error fetching the current class:', error);
     }
   };
 
-  // Poll the API every 5 seconds for venue and schedule data
+  // Fetch the venue on mount and again when this machine's assignment changes
   useEffect(() => {
-    const fetchData = async () => {
-      await fetchVenueID(); // Fetch VenueID first
-      await fetchScheduleData(); // Then fetch schedule data
-    };
+    fetchDisplayBootstrap();
 
-    fetchData(); // Fetch data immediately on mount
+    const unsubscribe = subscribeToChanges(['venue_reassigned', 'machines_changed'], (type, data) => {
+      if (type === 'venue_reassigned' && parseInt(data.machineID, 10) !== parseInt(MACHINE_ID, 10)) {
+        return; // Another machine was reassigned
+      }
+      fetchVenueID();
+    });
 
-    const interval = setInterval(fetchData, 1500); // Poll every 5 seconds
+    return unsubscribe; // Cleanup on unmount
+  }, []);
 
-    return () => clearInterval(interval); // Cleanup on unmount
-  }, [useDummyData, venueID]); // Re-run when `useDummyData` or `venueID` changes
+  // Fetch the current class when the venue changes; after that the backend announces each
+  // class change as it happens
+  useEffect(() => {
+    fetchCurrentClass();
+
+    const unsubscribe = subscribeToChanges(['class_changed'], (type, data) => {
+      if (type === 'resync') {
+        fetchCurrentClass();
+      } else if (data.VenueID === venueID) {
+        applyClassStatus(data);
+      }
+    });
+
+    // Slow safety-net poll in case the change feed is unavailable
+    const interval = setInterval(fetchCurrentClass, 60000);
+
+    return () => {
+      unsubscribe();
+      clearInterval(interval); // Cleanup on unmount
+    };
+  }, [venueID]); // Re-run when `venueID` changes
 
   // Update the current date every second
   useEffect(() => {
@@ -103,75 +128,6 @@ const ClassScheduleCard = ({ setLaboratoryName, setCurrentInstructor }) => {
     return () => clearInterval(interval); // Cleanup on unmount
   }, []);
 
-  // Algorithm to check if a schedule is the current one
-  useEffect(() => {
-    const checkCurrentSchedule = async () => {
-      const now = new Date();
-      const nowTimeString = now.toTimeString().split(' ')[0];
-      const currentDay = (now.getDay() || 7).toString();
-
-      const current = scheduleData.find((schedule) => {
-        const startTime = new Date(`1970-01-01T${schedule.StartTime}`);
-        const endTime = new Date(`1970-01-01T${schedule.EndTime}`);
-        const nowTime = new Date(`1970-01-01T${nowTimeString}`);
-        return (
-          nowTime >= startTime &&
-          nowTime <= endTime &&
-          schedule.DayOfWeek === currentDay
-        );
-      });
-
-      setCurrentSchedule(current || null);
-      setCurrentInstructor(current ? current.EmployeeNo : null);
-
-      // Fetch current_faculty from backend
-      let currentFaculty = null;
-      try {
-        const res = await axios.get('http://ws-server.local:5000/api/current_faculty');
-        currentFaculty = res.data;
-      } catch (err) {
-        console.error('Error fetching current_faculty:', err);
-      }
-
-      //FACULTY PRESENCE LOGIC
-      // If end_time in current_faculty is earlier than now, do not touch anything
-      if (
-        currentFaculty &&
-        currentFaculty.end_time
-      ) {
-        const now = new Date();
-        const [h, m, s] = currentFaculty.end_time.split(':');
-        const endTimeToday = new Date(now.getFullYear(), now.getMonth(), now.getDate(), h, m, s);
-
-        if (now < endTimeToday) {
-          console.log('Current time is before end_time, not updating current_faculty.');
-          return; // Do not update anything if the current time is before end_time
-        } else {
-          // Only update if end_time is different or isPresent is false
-          if (current) {
-            try {
-              await axios.put('http://ws-server.local:5000/api/current_faculty', {
-                empID: current.EmployeeNo,
-                full_name: `${current.FirstName?.trim() || ''} ${current.LastName?.trim() || ''}`,
-                isPresent: 0,
-                start_time: current.StartTime,
-                end_time: current.EndTime,
-              });
-            } catch (err) {
-              console.error('Error updating current_faculty:', err);
-            }
-          } else {
-            return;
-          }
-        }
-      };
-    }
-    checkCurrentSchedule();
-    const interval = setInterval(checkCurrentSchedule, 1000);
-
-    return () => clearInterval(interval);
-  }, [scheduleData, setCurrentInstructor]);
-
   return (
     <div className="flex justify-center items-center min-h-screen bg-gray-100 dark:bg-gray-900">
       <div className="w-full max-w-5xl bg-white dark:bg-gray-800 shadow-lg rounded-md border border-gray-200 dark:border-gray-700">
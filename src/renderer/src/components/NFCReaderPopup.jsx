@@ -51,7 +51,7 @@ const NFCReaderPopup = ({labName}) => {
           }
 
           // 2. Fetch student information using the UID
-          const response = await axios.get(`http://ws-server.local:5000/proxy/students/${scannedUid}`);
+          const response = await axios.get(`http://ws-server.local:5001/proxy/students/${scannedUid}`);
           const { StudentInfo, Picture } = response.data;
           if (response.data.status !== 200) {
             throw new Error('Failed to fetch student information');
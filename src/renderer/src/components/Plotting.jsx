@@ -9,19 +9,14 @@ const Plotting = ({ machineID }) => {
   useEffect(() => {
     const fetchVenueID = async () => {
       try {
-        const response = await axios.get('http://ws-server.local:5000/api/pctovenue');
-        const data = response.data;
-
-        // Find the VenueID for the given machineID
-        const machineVenue = data.find((item) => parseInt(item.machineID, 10) === parseInt(machineID, 10));
-        if (machineVenue) {
-          setVenueID(machineVenue.VenueID);
-        } else {
+        const response = await axios.get(`http://ws-server.local:5000/api/pctovenue/${machineID}`);
+        setVenueID(response.data.VenueID);
+      } catch (error) {
+        if (error.response?.status === 404) {
           console.warn('No VenueID found for the given machineID.');
-          setVenueID(null);
+        } else {
+          console.error('Error fetching VenueID:', error);
         }
-      } catch (error) {
-        console.error('Error fetching VenueID:', error);
         setVenueID(null);
       }
     };
@@ -36,7 +31,7 @@ const Plotting = ({ machineID }) => {
     const fetchSchedule = async () => {
       try {
         const response = await axios.post(
-          'http://ws-server.local:5000/proxy/course-plotting',
+          'http://ws-server.local:5001/proxy/course-plotting',
           { VenueID: venueID }
         );
         const scheduleArray = Array.isArray(response.data) ? response.data : response.data.data;
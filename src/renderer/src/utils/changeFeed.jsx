@@ -0,0 +1,23 @@
+// Shared connection to the backend change feed (Server-Sent Events).
+// Components subscribe to event types instead of polling the API.
+// EventSource reconnects on its own and resumes from the last event it saw;
+// a 'resync' event means events were missed and everything should be reloaded.
+let source = null;
+
+const getSource = () => {
+  if (!source) {
+    source = new EventSource('http://ws-server.local:5000/api/events');
+    source.onerror = (error) => {
+      console.error('Change feed error, reconnecting...', error);
+    };
+  }
+  return source;
+};
+
+export const subscribeToChanges = (eventTypes, handler) => {
+  const eventSource = getSource();
+  const listener = (event) => handler(event.type, JSON.parse(event.data));
+  const types = [...eventTypes, 'resync'];
+  types.forEach((type) => eventSource.addEventListener(type, listener));
+  return () => types.forEach((type) => eventSource.removeEventListener(type, listener));
+};
@@ -1,37 +1,191 @@
 import asyncio
-import websockets
-import ssl
 import json
-from py122u import nfc
+import os
+import time
+from http import HTTPStatus
+import websockets
 
-# Function to get the UID using py122u
-def getUID():
-    return input("Your message:")
+# Display command hub on port 8770 (replaces websocket-server.js)
+#   python websocket.py
+# Displays register which machine and venue they are, and the console's commands are
+# routed only to the displays they target, so traffic grows with the number of targets
+# rather than with the number of connected displays.
+#
+# Messages a client can send (JSON):
+#   {"type": "register", "machineID": 12, "venue": "V3", "topics": ["announcements"]}
+#   {"type": "command", "id": 7, "command": "show_schedule", "target": {"machines": [12], "venues": ["V3"], "topics": [...]}}
+#       "payload": {...} can be sent instead of "command" and is delivered as JSON.
+#       Without a target the command goes to every other client. The sender gets back
+#       {"type": "ack", "id": 7, "delivered": <number of clients>}.
+# Anything else (e.g. a plain "show_schedule") is broadcast to every other client as before.
+#
+# Each client has a bounded send queue, so a slow display loses its oldest messages
+# instead of holding up the others. Connections that stop answering pings are closed.
+# GET /metrics on the same port returns counters in the Prometheus text format.
 
-# WebSocket handler
-async def nfc_reader(websocket):
+HUB_HOST = os.getenv('HUB_HOST', '0.0.0.0')
+HUB_PORT = int(os.getenv('HUB_PORT', 8770))
+CLIENT_QUEUE_SIZE = int(os.getenv('HUB_CLIENT_QUEUE_SIZE', 32))  # Messages buffered per client
+PING_INTERVAL = float(os.getenv('HUB_PING_INTERVAL', 20))  # Seconds between pings
+PING_TIMEOUT = float(os.getenv('HUB_PING_TIMEOUT', 20))  # Seconds to wait for the pong before closing
+STATS_INTERVAL = float(os.getenv('HUB_STATS_INTERVAL', 60))  # Seconds between rate log lines; 0 disables
+
+clients = set()
+by_machine = {}  # machineID -> clients
+by_venue = {}  # VenueID -> clients
+by_topic = {}  # topic -> clients
+stats = {
+    'connections_total': 0,
+    'messages_received_total': 0,
+    'messages_sent_total': 0,
+    'messages_dropped_total': 0,
+    'commands_total': 0,
+}
+
+class Client:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.machine_id = None
+        self.venue = None
+        self.topics = set()
+
+def index(client):
+    if client.machine_id is not None:
+        by_machine.setdefault(client.machine_id, set()).add(client)
+    if client.venue is not None:
+        by_venue.setdefault(client.venue, set()).add(client)
+    for topic in client.topics:
+        by_topic.setdefault(topic, set()).add(client)
+
+def unindex(client):
+    for registry, keys in ((by_machine, [client.machine_id]), (by_venue, [client.venue]), (by_topic, client.topics)):
+        for key in keys:
+            members = registry.get(key)
+            if members is not None:
+                members.discard(client)
+                if not members:
+                    del registry[key]
+
+def register(client, data):
+    unindex(client)
+    machine_id = data.get('machineID')
+    client.machine_id = int(machine_id) if machine_id is not None else None
+    client.venue = data.get('venue')
+    client.topics = set(data.get('topics') or [])
+    index(client)
+
+# Clients a command is for; only the targeted registries are consulted
+def route(sender, target):
+    if not target:
+        return clients - {sender}
+    targets = set()
+    for machine_id in target.get('machines') or []:
+        targets |= by_machine.get(int(machine_id), set())
+    for venue in target.get('venues') or []:
+        targets |= by_venue.get(venue, set())
+    for topic in target.get('topics') or []:
+        targets |= by_topic.get(topic, set())
+    return targets
+
+def deliver(client, text):
+    if client.queue.full():
+        client.queue.get_nowait()  # Drop the oldest message rather than wait for a slow client
+        stats['messages_dropped_total'] += 1
+    client.queue.put_nowait(text)
+
+async def send_queued(client):
     try:
         while True:
-            uid = getUID()  # Get the UID from the NFC reader
-            if uid:
-                print(f"Card UID: {uid}")
-                await websocket.send(json.dumps({"message": uid}))  # Send UID to the WebSocket client
-            else:
-                print("No card detected or error reading UID.")
-            await asyncio.sleep(1)  # Poll every second
-    except Exception as e:
+            text = await client.queue.get()
+            await client.websocket.send(text)
+            stats['messages_sent_total'] += 1
+    except websockets.ConnectionClosed:
         pass
 
+def handle_message(client, message):
+    try:
+        data = json.loads(message)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or 'type' not in data:
+        # Plain messages keep the old behaviour: everyone else gets them
+        for other in route(client, None):
+            deliver(other, message)
+        return
+
+    if data['type'] == 'register':
+        register(client, data)
+    elif data['type'] == 'command':
+        stats['commands_total'] += 1
+        text = data['command'] if 'command' in data else json.dumps(data.get('payload'))
+        targets = route(client, data.get('target'))
+        for target in targets:
+            deliver(target, text)
+        if 'id' in data:
+            deliver(client, json.dumps({'type': 'ack', 'id': data['id'], 'delivered': len(targets)}))
+    else:
+        deliver(client, json.dumps({'type': 'error', 'error': f"Unknown message type: {data['type']}"}))
+
+# WebSocket handler
+async def hub(websocket):
+    client = Client(websocket)
+    clients.add(client)
+    stats['connections_total'] += 1
+    sender = asyncio.create_task(send_queued(client))
+    try:
+        async for message in websocket:
+            stats['messages_received_total'] += 1
+            try:
+                handle_message(client, message)
+            except (TypeError, ValueError, AttributeError) as e:
+                deliver(client, json.dumps({'type': 'error', 'error': str(e)}))
+    except websockets.ConnectionClosed:
+        pass  # Includes connections closed for not answering pings
+    finally:
+        clients.discard(client)
+        unindex(client)
+        sender.cancel()
+
+def render_metrics():
+    lines = []
+    for name, value in stats.items():
+        lines.append(f'# TYPE hub_{name} counter')
+        lines.append(f'hub_{name} {value}')
+    lines.append('# TYPE hub_clients gauge')
+    lines.append(f'hub_clients {len(clients)}')
+    lines.append('# TYPE hub_registered_machines gauge')
+    lines.append(f'hub_registered_machines {len(by_machine)}')
+    return '\n'.join(lines) + '\n'
+
+def process_request(connection, request):
+    if request.path == '/metrics':
+        return connection.respond(HTTPStatus.OK, render_metrics())
+    return None  # Continue with the websocket handshake
+
+async def log_rates():
+    previous, previous_at = dict(stats), time.monotonic()
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        now = time.monotonic()
+        rate = {name: (stats[name] - previous[name]) / (now - previous_at) for name in stats}
+        print(
+            f"{len(clients)} clients, {len(by_machine)} machines registered; "
+            f"{rate['messages_received_total']:.1f} msg/s in, {rate['messages_sent_total']:.1f} msg/s out, "
+            f"{rate['messages_dropped_total']:.1f} dropped/s"
+        )
+        previous, previous_at = dict(stats), now
+
 # Main function to start the WebSocket server
 async def main():
-    # Load SSL certificate and private key
-    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-    ssl_context.load_cert_chain(certfile="acertificate.pem", keyfile="aprivatekey.pem")
-
-    # Start the WebSocket server with SSL
-    async with websockets.serve(nfc_reader, "localhost", 8770, ssl=ssl_context):
-        print("Secure WebSocket server started at wss://localhost:8765")
+    if STATS_INTERVAL:
+        rate_logger = asyncio.create_task(log_rates())  # Keep a reference so it isn't garbage collected
+    async with websockets.serve(
+        hub, HUB_HOST, HUB_PORT, process_request=process_request,
+        ping_interval=PING_INTERVAL, ping_timeout=PING_TIMEOUT,
+    ):
+        print(f"Display command hub started at ws://{HUB_HOST}:{HUB_PORT}")
         await asyncio.Future()  # Run forever
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())